@@ -10,10 +10,12 @@ from flask import Flask, render_template, redirect, url_for, flash, request, ses
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_mail import Mail
+from flask_migrate import Migrate, upgrade as upgrade_database
 from textblob import TextBlob
 
 # Import from local files
-from models import db, User, Product, Order, OrderItem, Review, ReviewImage, Wishlist
+from models import (db, User, Product, Order, OrderItem, Review, ReviewImage, Wishlist, catalog_revision,
+                    catalog_version, listing_rows)
 from forms import LoginForm, RegisterForm, ReviewForm
 
 # Optional dotenv for local development
@@ -39,6 +41,30 @@ if database_url and database_url.startswith('postgres://'):
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Search backend: 'memory' (SmartSearch index) or 'database' (SQLite FTS5 / PostgreSQL tsvector)
+app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'memory')
+# Worker processes the in-memory index is split across (1 = score in the request thread)
+app.config['SEARCH_SHARDS'] = int(os.environ.get('SEARCH_SHARDS', 1))
+# Saved search index, reused at startup while the catalog is unchanged (empty = always rebuild)
+app.config['SEARCH_SNAPSHOT_DIR'] = os.environ.get('SEARCH_SNAPSHOT_DIR',
+                                                   os.path.join(app.instance_path, 'search_index'))
+# Optional synonym groups for search, one comma-separated group per line (default: built-in groups)
+app.config['SEARCH_SYNONYMS_FILE'] = os.environ.get('SEARCH_SYNONYMS_FILE')
+
+# Products per page (and per infinite-scroll batch) on listing pages
+app.config['PRODUCTS_PER_PAGE'] = int(os.environ.get('PRODUCTS_PER_PAGE', 24))
+
+# Seconds the cached home page blocks are served before a background re-check
+app.config['HOME_CACHE_TTL'] = int(os.environ.get('HOME_CACHE_TTL', 60))
+
+# Rendered product cards kept for listing pages (about 5 KB each)
+app.config['CARD_CACHE_SIZE'] = int(os.environ.get('CARD_CACHE_SIZE', 5000))
+
+# Product lookups by id: shared Redis-protocol cache when a URL is set, else in-process LRU
+app.config['PRODUCT_CACHE_URL'] = os.environ.get('PRODUCT_CACHE_URL')
+app.config['PRODUCT_CACHE_SIZE'] = int(os.environ.get('PRODUCT_CACHE_SIZE', 10000))
+app.config['PRODUCT_CACHE_TTL'] = int(os.environ.get('PRODUCT_CACHE_TTL', 300))
+
 # Upload configuration
 app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
@@ -93,11 +119,33 @@ print(f"📁 Upload folder set to: {app.config['UPLOAD_FOLDER']}")
 
 # ========== INITIALIZE EXTENSIONS ==========
 db.init_app(app)
+# The schema is owned by the migrations, applied by `flask db upgrade` in the
+# release step; the full-text search objects are made by setup_fulltext()
+# and left out of autogenerate
+from utils.fulltext import migration_include_object
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'),
+                  include_object=migration_include_object)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 mail = Mail(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+# Home page blocks, refreshed in the background when the catalog changes
+from utils.home_cache import HomeCache
+home_cache = HomeCache(app, ttl=app.config['HOME_CACHE_TTL'])
+# Category navigation, re-read after product changes
+from models import catalog_listeners
+from utils.categories import category_navigation, clear_category_cache
+catalog_listeners.append(clear_category_cache)
+# Rendered product cards for includes/product_grid.html, re-rendered when a card's fields change
+from utils.card_cache import CardCache
+card_cache = CardCache(app, size=app.config['CARD_CACHE_SIZE'])
+app.add_template_global(card_cache.render_cards, 'product_cards')
+# Products by id for product pages, quick view and the cart; invalidated where products change
+from utils.product_cache import ProductCache
+product_cache = ProductCache.from_config(app.config['PRODUCT_CACHE_URL'],
+                                         size=app.config['PRODUCT_CACHE_SIZE'],
+                                         ttl=app.config['PRODUCT_CACHE_TTL'])
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -115,32 +163,34 @@ def inject_now():
 
 @app.route('/')
 def home():
-    # Get latest 5 products (newest first)
-    latest_products = Product.query.order_by(Product.created_at.desc()).limit(5).all()
-    
-    # Get best seller products (highest rated)
-    best_seller_products = Product.query.order_by(Product.rating.desc()).limit(5).all()
-    
-    # Total products count
-    total_products = Product.query.count()
+    # Latest 5, best sellers and total count, cached per catalog version
+    blocks = home_cache.get()
+    latest_products = blocks['latest_products']
+    best_seller_products = blocks['best_seller_products']
+    total_products = blocks['total_products']
     
     # Get user's wishlist IDs if logged in
     user_wishlist_ids = []
     if current_user.is_authenticated:
         user_wishlist_ids = [item.product_id for item in current_user.wishlist_items]
-        
-    categories = ['Appliances', 'Home & Kitchen', 'Fashion', 'Sports', 'Beauty', 'Toys', 'Books', 'Furniture', 
-                  'Bags', 'Mobiles', 'Laptop', 'Watch', 'Men Dresses', 'Woman Dresses', 'Decorations', 
-                  'Pets care', 'Bathing products', 'Skin care', 'Face care', 'Shoes', 'Mens Accesories', 
-                  'Women Accesories', 'Gifts', 'Hair care']
     
-    return render_template('index.html', 
+    # Category navigation with product counts, from the cached Category table
+    category_totals = category_navigation()
+    
+    # Unchanged blocks, categories and visitor: answer a revalidation with 304
+    etag = make_etag('home', blocks['version'], tuple(category_totals.items()), viewer_state())
+    unchanged = not_modified(etag, private=True)
+    if unchanged:
+        return unchanged
+    
+    return with_validators(render_template('index.html', 
                          featured_products=latest_products,
                          latest_products=latest_products,
                          best_seller_products=best_seller_products,
                          total_products=total_products,
-                         categories=categories,
-                         user_wishlist_ids=user_wishlist_ids)  # ← ADD THIS LINE
+                         categories=list(category_totals),
+                         category_totals=category_totals,
+                         user_wishlist_ids=user_wishlist_ids), etag, private=True)
 
 
 @app.route('/about')
@@ -161,11 +211,15 @@ from sqlalchemy import func
 from sqlalchemy import func
 
 # At the top of app.py, add these imports
-from utils.smart_search import SmartSearch, SearchHistory
+from utils.smart_search import SearchHistory, ShardedSearch, load_synonyms, search_index
+from utils.fulltext import setup_fulltext, fulltext_search, fulltext_facets
+from utils.facets import facet_counts
+from utils.pagination import keyset_page
+from utils.http_cache import make_etag, not_modified, viewer_state, with_validators
 from functools import lru_cache
 import time
 
-# Initialize search history (can be stored in database later)
+# Search history, persisted in batches by a background thread (see init_app below)
 search_history = SearchHistory()
 @app.route('/search')
 def search():
@@ -187,44 +241,43 @@ def search():
                              popular_searches=popular,
                              search_time=0)
     
-    # Get all products (you might want to cache this)
-    products = Product.query.all()
-    
-    # Create smart search instance
-    smart_search = SmartSearch(products)
-    
-    # Perform smart search
-    results = smart_search.search(query)
+    start = (page - 1) * per_page
+    if app.config['SEARCH_BACKEND'] == 'database':
+        # Let the database match, rank and page the results
+        page_ids, total = fulltext_search(db, query, per_page, start)
+        facets = fulltext_facets(db, query) if total else None
+    else:
+        # Perform smart search against the shared index, ranking only up to this page
+        results, total = search_index.search(query, limit=per_page, offset=start)
+        page_ids = [product_id for product_id, _ in results]
+        # Counts over every match, not just this page (reuses the cached ranking)
+        facets = search_index.facets(query) if total else None
     
     # Log the search
-    search_history.log_search(query, len(results))
+    search_history.log_search(query, total)
     
     # Check if we should suggest spelling correction
-    if len(results) == 0:
-        corrected = smart_search.suggest_corrections(query)
+    if total == 0:
+        corrected = search_index.suggest_corrections(query)
         if corrected and corrected != query:
             flash(f'Did you mean: "{corrected}"?', 'info')
     
     # Get related searches
     related = search_history.get_related_searches(query)
     
-    # Extract just the products from results
-    products_found = [r[0] for r in results]
-    
     # Get user's wishlist IDs if logged in
     user_wishlist_ids = []
     if current_user.is_authenticated:
         user_wishlist_ids = [item.product_id for item in current_user.wishlist_items]
     
+    # Load only the products on this page, keeping the ranked order
+    page_products = ({p.id: p for p in listing_rows(Product.query.filter(Product.id.in_(page_ids))).all()}
+                     if page_ids else {})
+    paginated_products = [page_products[pid] for pid in page_ids if pid in page_products]
+    
     # Calculate search time
     search_time = round((time.time() - start_time) * 1000, 2)
     
-    # Paginate results
-    total = len(products_found)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated_products = products_found[start:end]
-    
     return render_template('search_results.html',
                          products=paginated_products,
                          query=query,
@@ -233,9 +286,34 @@ def search():
                          per_page=per_page,
                          search_time=search_time,
                          related_searches=related,
+                         facets=facets,
                          user_wishlist_ids=user_wishlist_ids)  # ← ADD THIS LINE
 
 
+@app.route('/search/suggest')
+def search_suggest():
+    """
+    Typeahead suggestions for the search box, called on every keystroke
+    """
+    prefix = request.args.get('q', '').strip()
+    if not prefix:
+        return jsonify({'query': '', 'searches': [], 'suggestions': []})
+    
+    # Completions from what other shoppers searched for
+    normalized = search_index.normalize_query(prefix)
+    searches = [q for q, _ in search_history.get_popular_searches(50)
+                if q.startswith(normalized) and q != normalized][:3]
+    
+    suggestions = search_index.suggest(prefix, limit=8)
+    for suggestion in suggestions:
+        if suggestion['type'] == 'product':
+            suggestion['url'] = url_for('product_detail', product_id=suggestion['id'])
+        else:
+            suggestion['url'] = url_for('all_products', **{suggestion['type']: suggestion['text']})
+    
+    return jsonify({'query': prefix, 'searches': searches, 'suggestions': suggestions})
+
+
 @app.route('/search/click', methods=['POST'])
 def track_search_click():
     """
@@ -247,6 +325,10 @@ def track_search_click():
     product_id = data.get('product_id')
     
     if query and product_id:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return jsonify({'success': False}), 400
         search_history.log_click(query, product_id)
         return jsonify({'success': True})
     return jsonify({'success': False}), 400
@@ -486,20 +568,27 @@ def save_chat_transcript(chat_data):
 
 @app.route('/products')
 def all_products():
-    # Define categories
-    categories = ['Appliances', 'Home & Kitchen', 'Fashion', 'Sports', 'Beauty', 'Toys', 'Books', 'Furniture', 
-                  'Bags', 'Mobiles', 'Laptop', 'Watch', 'Men Dresses', 'Woman Dresses', 'Decorations', 
-                  'Pets care', 'Bathing products', 'Skin care', 'Face care', 'Shoes', 'Mens Accesories', 
-                  'Women Accesories', 'Gifts', 'Hair care']
+    # Category navigation with product counts, from the cached Category table
+    category_totals = category_navigation()
+    categories = list(category_totals)
     
     # Get filter parameters
     category = request.args.get('category')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
     brand = request.args.get('brand')
+    min_rating = request.args.get('min_rating', type=float)
     sort = request.args.get('sort', 'newest')
+    cursor = request.args.get('cursor')
+    
+    # Same catalog, category counts, filters and visitor as the cached copy: skip the
+    # queries and rendering. The counts are cached per process and may lag the catalog.
+    etag = make_etag('products', catalog_revision(), tuple(category_totals.items()),
+                     sorted(request.args.items(multi=True)), viewer_state())
+    unchanged = not_modified(etag, private=True)
+    if unchanged:
+        return unchanged
     
-    # IMPORTANT: Get ALL products first
     query = Product.query
     
     # Apply filters if they exist
@@ -509,25 +598,29 @@ def all_products():
         query = query.filter(Product.price >= min_price)
     if max_price and max_price > 0:
         query = query.filter(Product.price <= max_price)
+    if min_rating:
+        query = query.filter(Product.rating >= min_rating)
+    # Brand last: the brand counts are taken without it
+    brand_query = None
     if brand and brand != '':
+        brand_query = query
         query = query.filter(Product.brand == brand)
     
-    # Apply sorting
-    if sort == 'price_low':
-        query = query.order_by(Product.price.asc())
-    elif sort == 'price_high':
-        query = query.order_by(Product.price.desc())
-    elif sort == 'rating':
-        query = query.order_by(Product.rating.desc())
-    else:
-        query = query.order_by(Product.created_at.desc())
+    # Category, brand, price and rating counts for the sidebar, in one GROUP BY
+    facets = facet_counts(query, brand_query)
     
-    # Get ALL products (not paginated)
-    all_products = query.all()
+    # One page in the chosen sort order; later pages come from
+    # /api/filter-products as the shopper scrolls
+    all_products, next_cursor = keyset_page(listing_rows(query), sort, cursor,
+                                            app.config['PRODUCTS_PER_PAGE'])
     
-    # Get unique brands for filter sidebar
-    brands_raw = db.session.query(Product.brand).distinct().all()
-    brands = [b[0] for b in brands_raw if b[0]]
+    # Brands for filter sidebar, straight from the facet counts
+    brands = [facet['value'] for facet in facets['brand']]
+    category_counts = {facet['value']: facet['count'] for facet in facets['category']}
+    # Every product has a category, so this is the number of matches
+    total = sum(category_counts.values())
+    # Plain link to the next page for browsers without infinite scroll
+    more_url = url_for('all_products', **{**request.args.to_dict(), 'cursor': next_cursor}) if next_cursor else None
     
     # Get user's wishlist IDs if logged in
     user_wishlist_ids = []
@@ -540,15 +633,21 @@ def all_products():
     print(f"User authenticated: {current_user.is_authenticated}")
     print(f"User ID: {current_user.id if current_user.is_authenticated else 'Not logged in'}")
     print(f"User wishlist IDs: {user_wishlist_ids}")
-    print(f"Number of products: {len(all_products)}")
+    print(f"Number of products: {len(all_products)} of {total}")
     print("=" * 50)
     
-    return render_template('all_products.html', 
+    return with_validators(render_template('all_products.html', 
                          products=all_products, 
+                         total=total,
+                         next_cursor=next_cursor,
+                         more_url=more_url,
                          brands=brands,
                          categories=categories,
+                         category_totals=category_totals,
+                         facets=facets,
+                         category_counts=category_counts,
                          filters=request.args,
-                         user_wishlist_ids=user_wishlist_ids)  # ← Make sure this is here!
+                         user_wishlist_ids=user_wishlist_ids), etag, private=True)
 
 
 @app.route('/test-wishlist')
@@ -566,10 +665,9 @@ def test_wishlist():
 
 @app.route('/product/<int:product_id>')
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    related_products = Product.query.filter_by(category=product.category)\
-                                   .filter(Product.id != product_id)\
-                                   .limit(4).all()
+    product = product_cache.get_or_404(product_id)
+    # Reviews aren't cached; the template reads them as product.product_reviews
+    product.product_reviews = Review.query.filter_by(product_id=product_id).all()
     
     # Track recently viewed
     recent = session.get('recently_viewed', [])
@@ -585,6 +683,17 @@ def product_detail(product_id):
     recent = recent[:6]
     session['recently_viewed'] = recent
     
+    # The page shows the product, its reviews, related and recent products and the visitor
+    etag = make_etag('product', product.id, catalog_revision(), len(product.product_reviews), recent,
+                     viewer_state())
+    unchanged = not_modified(etag, private=True)
+    if unchanged:
+        return unchanged
+    
+    related_products = Product.query.filter_by(category=product.category)\
+                                   .filter(Product.id != product_id)\
+                                   .limit(4).all()
+    
     # Get recent products
     recent_products = []
     if recent:
@@ -592,10 +701,10 @@ def product_detail(product_id):
         # Sort by the order in session
         recent_products.sort(key=lambda x: recent.index(x.id))
     
-    return render_template('product_detail.html', 
+    return with_validators(render_template('product_detail.html', 
                          product=product, 
                          related_products=related_products,
-                         recent_products=recent_products)
+                         recent_products=recent_products), etag, private=True)
 
 
 @app.route('/api/wishlist/add/<int:product_id>', methods=['POST'])
@@ -712,7 +821,7 @@ def admin_edit_order(order_id):
 @app.route('/add-to-cart/<int:product_id>', methods=['POST'])
 def add_to_cart(product_id):
     try:
-        product = Product.query.get_or_404(product_id)
+        product = product_cache.get_or_404(product_id)
         data = request.get_json()
         
         if not data:
@@ -768,7 +877,7 @@ def check_orders():
 @app.route('/test-cart/<int:product_id>')
 def test_cart(product_id):
     try:
-        product = Product.query.get_or_404(product_id)
+        product = product_cache.get_or_404(product_id)
         cart = get_cart()
         
         cart.append({
@@ -1011,7 +1120,8 @@ def admin_dashboard():
 @login_required
 @admin_required
 def admin_products():
-    products = Product.query.order_by(Product.created_at.desc()).all()
+    products = (listing_rows(Product.query, Product.category, Product.stock)
+                .order_by(Product.created_at.desc()).all())
     return render_template('admin/products.html', products=products)
 
 @app.route('/admin/product/add', methods=['GET', 'POST'])
@@ -1048,13 +1158,11 @@ def admin_add_product():
         
         db.session.add(product)
         db.session.commit()
+        search_index.add_product(product)
         flash('Product added successfully!', 'success')
         return redirect(url_for('admin_products'))
     
-    categories = ['Appliances', 'Home & Kitchen', 'Fashion', 'Sports', 'Beauty', 'Toys', 'Books', 
-                  'Furniture', 'Bags', 'Mobiles', 'Laptop', 'Watch', 'Men Dresses', 'Woman Dresses', 
-                  'Decorations', 'Pets care', 'Bathing products', 'Skin care', 'Face care', 'Shoes', 
-                  'Mens Accesories', 'Women Accesories', 'Gifts', 'Hair care']
+    categories = list(category_navigation())
     
     brands = ['Apple', 'Samsung', 'OnePlus', 'Google', 'Xiaomi', 'Nike', 'Adidas', 'Puma', 
               'Levi\'s', 'H&M', 'Zara', 'Arrow', 'US Polo', 'Raymond', 'Woodland']
@@ -1112,13 +1220,12 @@ def admin_edit_product(product_id):
         product.image = request.form.get('image', product.image)
         
         db.session.commit()
+        search_index.update_product(product)
+        product_cache.invalidate(product.id)
         flash('Product updated successfully!', 'success')
         return redirect(url_for('admin_products'))
     
-    categories = ['Appliances', 'Home & Kitchen', 'Fashion', 'Sports', 'Beauty', 'Toys', 'Books', 
-                  'Furniture', 'Bags', 'Mobiles', 'Laptop', 'Watch', 'Men Dresses', 'Woman Dresses', 
-                  'Decorations', 'Pets care', 'Bathing products', 'Skin care', 'Face care', 'Shoes', 
-                  'Mens Accesories', 'Women Accesories', 'Gifts', 'Hair care']
+    categories = list(category_navigation())
     
     brands = ['Apple', 'Samsung', 'OnePlus', 'Google', 'Xiaomi', 'Nike', 'Adidas', 'Puma', 
               'Levi\'s', 'H&M', 'Zara', 'Arrow', 'US Polo', 'Raymond', 'Woodland']
@@ -1132,13 +1239,29 @@ def admin_delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
     db.session.commit()
+    search_index.remove_product(product_id)
+    product_cache.invalidate(product_id)
     flash('Product deleted successfully!', 'success')
     return redirect(url_for('admin_products'))
 #-------------------------------------------------------------------------------------------------------------------------------------
 @app.route('/api/product/<int:product_id>')
 def api_product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    return jsonify({
+    product = product_cache.get_or_404(product_id)
+    # Quick view asks for the same product again and again; revalidations get a 304
+    etag = make_etag('api_product', product.id, product.updated_at)
+    unchanged = not_modified(etag, product.updated_at)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify(product_api_data(product)), etag, product.updated_at)
+
+# Fields of a product in the JSON APIs; /api/products can ask for a subset
+PRODUCT_API_FIELDS = ('id', 'name', 'price', 'image', 'description', 'rating', 'reviews')
+
+# Most products one /api/products request may ask for
+MAX_BATCH_PRODUCTS = 100
+
+def product_api_data(product, fields=PRODUCT_API_FIELDS):
+    data = {
         'id': product.id,
         'name': product.name,
         'price': product.price,
@@ -1146,7 +1269,59 @@ def api_product_detail(product_id):
         'description': product.short_description,
         'rating': product.rating,
         'reviews': product.reviews_count
-    })    
+    }
+    return {field: data[field] for field in fields}
+
+@app.route('/api/products')
+def api_products():
+    """
+    Several products in one request, for quick view, wishlist and cart:
+    /api/products?ids=3,1,2&fields=id,name,price
+    Products come back in the order asked for; unknown ids are left out.
+    """
+    try:
+        ids = [int(product_id) for product_id in request.args.get('ids', '').split(',') if product_id.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'error': 'ids must be comma-separated product ids'}), 400
+    if not ids or len(ids) > MAX_BATCH_PRODUCTS:
+        return jsonify({'success': False, 'error': f'ask for 1 to {MAX_BATCH_PRODUCTS} products'}), 400
+    
+    # Sparse fieldsets: only the fields asked for, in the usual order
+    requested = {field.strip() for field in request.args.get('fields', '').split(',') if field.strip()}
+    unknown = requested - set(PRODUCT_API_FIELDS)
+    if unknown:
+        return jsonify({'success': False, 'error': f"unknown fields: {', '.join(sorted(unknown))}"}), 400
+    fields = [field for field in PRODUCT_API_FIELDS if field in requested] or PRODUCT_API_FIELDS
+    
+    # Cached products, and one IN query for the rest
+    found = product_cache.get_many(ids)
+    products = [found[product_id] for product_id in dict.fromkeys(ids) if product_id in found]
+    
+    etag = make_etag('api_products', fields, [(product.id, product.updated_at) for product in products])
+    last_modified = max((product.updated_at for product in products if product.updated_at), default=None)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify([product_api_data(product, fields) for product in products]),
+                           etag, last_modified)
+
+@app.route('/metrics')
+def metrics():
+    """
+    Product cache counters of this worker in the Prometheus text format
+    """
+    stats = product_cache.stats()
+    lines = []
+    for name, kind, help_text in [('hits', 'counter', 'Product lookups answered from the cache'),
+                                  ('misses', 'counter', 'Product lookups read from the database'),
+                                  ('invalidations', 'counter', 'Products dropped after a change'),
+                                  ('errors', 'counter', 'Cache backend errors, served from the database'),
+                                  ('size', 'gauge', 'Products held in the cache')]:
+        metric = f"triowise_product_cache_{name}{'_total' if kind == 'counter' else ''}"
+        lines += [f"# HELP {metric} {help_text}",
+                  f"# TYPE {metric} {kind}",
+                  f'{metric}{{backend="{stats["backend"]}"}} {stats[name]}']
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 #-------------------------------------------------------------------------------------------------------------------------------------
 @app.route('/admin/update-order/<int:order_id>', methods=['POST'])
 @login_required
@@ -1365,33 +1540,42 @@ def filter_products_api():
     if data.get('max_price'):
         query = query.filter(Product.price <= float(data['max_price']))
     
-    if data.get('brands'):
-        query = query.filter(Product.brand.in_(data['brands']))
-    
     if data.get('min_rating'):
         query = query.filter(Product.rating >= float(data['min_rating']))
     
-    # Sorting
+    # Brand last: the brand counts are taken without it
+    brand_query = None
+    if data.get('brands'):
+        brand_query = query
+        query = query.filter(Product.brand.in_(data['brands']))
+    
+    # Sorting and paging; 'cursor' (the previous response's next_cursor)
+    # continues the list for infinite scroll
     sort_by = data.get('sort_by', 'newest')
-    if sort_by == 'price_low':
-        query = query.order_by(Product.price.asc())
-    elif sort_by == 'price_high':
-        query = query.order_by(Product.price.desc())
-    elif sort_by == 'rating':
-        query = query.order_by(Product.rating.desc())
-    else:
-        query = query.order_by(Product.created_at.desc())
+    cursor = data.get('cursor')
+    per_page = max(1, min(int(data.get('limit') or app.config['PRODUCTS_PER_PAGE']), 100))
+    products, next_cursor = keyset_page(listing_rows(query), sort_by, cursor, per_page)
     
-    products = query.all()
+    user_wishlist_ids = []
+    if current_user.is_authenticated:
+        user_wishlist_ids = [item.product_id for item in current_user.wishlist_items]
     
     # Render HTML for products
-    html = render_template('includes/product_grid.html', products=products)
+    html = render_template('includes/product_grid.html', products=products,
+                           user_wishlist_ids=user_wishlist_ids)
     
-    return jsonify({
+    response = {
         'success': True,
         'html': html,
-        'count': len(products)
-    })
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
+    if not cursor:
+        # Counts for the filter sidebar, in one GROUP BY over the filtered products;
+        # scrolled pages keep the first page's
+        response['facets'] = facet_counts(query, brand_query)
+        response['count'] = sum(facet['count'] for facet in response['facets']['category'])
+    return jsonify(response)
 
 #-------------------------------------------------------------------------------------------------------------------------------------
 @app.route('/debug-products')
@@ -2387,15 +2571,84 @@ Product(name='Redmi 12 5G', price=12499, compare_price=14999, discount=17,
         print(f"📊 Database already has {Product.query.count()} products")
 
 #-------------------------------------------------------------------------------------------------------------------------------------
-# With this:
-with app.app_context():
-    db.create_all()
+def schema_is_current():
+    """
+    Whether every migration has been applied to the database. Deploys apply
+    them once in the release step (flask db upgrade); workers only check.
+    """
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    
+    with db.engine.connect() as connection:
+        applied = set(MigrationContext.configure(connection).get_current_heads())
+    return applied == set(ScriptDirectory(migrate.directory).get_heads())
+
+def load_catalog():
+    """
+    Startup data work: sample products, the search index and search
+    history. Needs an up-to-date schema.
+    """
+    global search_index
+    
     # Only create sample products if the table is empty
     if Product.query.count() == 0:
         create_sample_products()
         print("✅ Sample products created!")
     else:
         print(f"📊 Database already has {Product.query.count()} products")
+    
+    # Keep the database full-text index in sync with the product table
+    if app.config['SEARCH_BACKEND'] == 'database' and not setup_fulltext(db):
+        app.config['SEARCH_BACKEND'] = 'memory'
+    print(f"🔍 Search backend: {app.config['SEARCH_BACKEND']}")
+    
+    # Very large catalogs can be scored in parallel by several worker processes
+    if app.config['SEARCH_SHARDS'] > 1:
+        if ShardedSearch.supported():
+            search_index = ShardedSearch(app.config['SEARCH_SHARDS'])
+        else:
+            print("⚠️ Sharded search needs fork(), using a single in-process index")
+    
+    if app.config['SEARCH_SYNONYMS_FILE']:
+        search_index.set_synonyms(load_synonyms(app.config['SEARCH_SYNONYMS_FILE']))
+    
+    # Build the search index once per process (also used for spelling suggestions),
+    # or load the snapshot saved by an earlier start if the catalog hasn't changed
+    snapshot_dir = app.config['SEARCH_SNAPSHOT_DIR']
+    index_state = search_history.index_state()
+    current_version = catalog_version()
+    if snapshot_dir and search_index.load_snapshot(snapshot_dir, current_version):
+        print(f"🔍 Search index loaded from snapshot for {len(search_index)} products")
+    else:
+        search_index.build_index(Product.query.all())
+        print(f"🔍 Search index built for {len(search_index)} products")
+        if snapshot_dir:
+            try:
+                search_index.save_snapshot(snapshot_dir, current_version)
+            except OSError as e:
+                # Read-only filesystems (e.g. serverless) just rebuild every start
+                print(f"⚠️ Could not save search index snapshot: {e}")
+    
+    # Load stored search history and start its background writer, which
+    # also refreshes the index's click-through boosts and applies other
+    # workers' product changes to the index
+    search_history.init_app(app, search_index, index_state)
+
+def init_database():
+    """
+    Apply the migrations, then load the catalog: for local runs and scripts
+    with a database of their own (deploys upgrade in the release step)
+    """
+    with app.app_context():
+        upgrade_database()
+        load_catalog()
+
+with app.app_context():
+    if schema_is_current():
+        load_catalog()
+    else:
+        # e.g. `flask db upgrade` itself, or a worker started before the release step ran
+        print("⚠️ Database schema is behind the migrations, run `flask db upgrade`")
 
 
     
@@ -2473,7 +2726,7 @@ If you receive this, email is working correctly!
 @app.route('/product/<int:product_id>/review', methods=['GET', 'POST'])
 @login_required
 def product_review(product_id):
-    product = Product.query.get_or_404(product_id)
+    product = product_cache.get_or_404(product_id)
     form = ReviewForm()
     
     # Check if user already reviewed this product
@@ -2529,13 +2782,17 @@ def product_review(product_id):
                     )
                     db.session.add(review_image)
         
-        # Update product's average rating
+        # Update product's average rating (on the database row, not the cached copy)
+        product = db.session.get(Product, product_id)
         all_reviews = Review.query.filter_by(product_id=product_id).all()
         avg_rating = sum(r.rating for r in all_reviews) / len(all_reviews)
         product.rating = round(avg_rating, 1)
         product.reviews_count = len(all_reviews)
         
         db.session.commit()
+        # Rating feeds the search popularity bonus
+        search_index.update_product(product)
+        product_cache.invalidate(product_id)
         
         flash(f'Thank you for your review! Sentiment detected: {sentiment}', 'success')
         return redirect(url_for('product_detail', product_id=product_id))
@@ -2621,12 +2878,15 @@ if __name__ == '__main__':
     print(f"🔧 Debug Mode: {debug_mode}")
     print(f"📊 Database: {app.config['SQLALCHEMY_DATABASE_URI']}")
     
+    # Local runs bring their own database up to date; deploys do it in the release step
+    with app.app_context():
+        schema_current = schema_is_current()
+    if not schema_current:
+        init_database()
+        print("✅ Database schema is up to date")
+    
     # ALL DATABASE QUERIES MUST BE INSIDE app.app_context()
     with app.app_context():
-        # Create tables if they don't exist
-        db.create_all()
-        print("✅ Database tables created/verified")
-        
         # Now these queries work!
         user_count = User.query.count()
         order_count = Order.query.count()
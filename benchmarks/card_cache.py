@@ -0,0 +1,78 @@
+# benchmarks/card_cache.py
+"""
+Benchmark rendering a page of product cards: template loop vs card cache
+
+Renders a page of the sample catalog's cards, with some of them in the
+shopper's wishlist, through the old per-card template loop and through
+includes/product_grid.html backed by the card cache, cold and warm:
+
+    python benchmarks/card_cache.py
+    python benchmarks/card_cache.py --cards 50 --runs 500
+"""
+import argparse
+import os
+import sys
+import time
+
+# Throwaway database with the sample products; set before the app is imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['SEARCH_SNAPSHOT_DIR'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import render_template
+from app import app, card_cache, init_database
+from models import Product, listing_rows
+
+# product_grid.html before the card cache: the card markup inline in a loop
+TEMPLATE_LOOP = """
+{% from 'includes/product_card.html' import product_card %}
+{% for product in products %}{{ product_card(product,
+    'active' if product.id in user_wishlist_ids else '',
+    'solid' if product.id in user_wishlist_ids else 'regular') }}{% endfor %}
+"""
+
+
+def timed(function, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the product card cache')
+    parser.add_argument('--cards', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    init_database()
+    with app.test_request_context('/products'):
+        products = listing_rows(Product.query).order_by(Product.id).limit(args.cards).all()
+        wishlist_ids = [product.id for product in products[::10]]
+        loop = app.jinja_env.from_string(TEMPLATE_LOOP)
+
+        def uncached():
+            return loop.render(products=products, user_wishlist_ids=wishlist_ids)
+
+        def cached():
+            return render_template('includes/product_grid.html', products=products, user_wishlist_ids=wishlist_ids)
+
+        def cold():
+            card_cache.clear()
+            return cached()
+
+        # Compile both templates before timing
+        uncached(), cached()
+        print("=" * 60)
+        print(f"🃏 {len(products)} cards, {len(wishlist_ids)} in the wishlist")
+        loop_ms = timed(uncached, args.runs)
+        cold_ms = timed(cold, max(args.runs // 10, 1))
+        warm_ms = timed(cached, args.runs)
+        print(f"   template loop {loop_ms:8.2f}ms")
+        print(f"   cache cold    {cold_ms:8.2f}ms")
+        print(f"   cache warm    {warm_ms:8.2f}ms   🚀 {loop_ms / warm_ms:.0f}x faster")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
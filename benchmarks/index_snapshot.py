@@ -0,0 +1,61 @@
+# benchmarks/index_snapshot.py
+"""
+Benchmark cold start of the search index: build vs load a snapshot
+
+Builds SmartSearch for a synthetic catalog (see search_benchmark.py),
+saves a snapshot, then times loading it into a fresh index and the first
+search and typeahead after the load:
+
+    python benchmarks/index_snapshot.py
+    python benchmarks/index_snapshot.py --products 1000000 --path /tmp/search_index
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.smart_search import SmartSearch
+from search_benchmark import make_catalog, make_queries
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search index snapshots')
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--path', help='snapshot directory (default: a temporary one)')
+    args = parser.parse_args()
+
+    products = make_catalog(args.products)
+    query = make_queries(products, 1)['exact'][0]
+    path = args.path or os.path.join(tempfile.mkdtemp(), 'search_index')
+
+    print("=" * 60)
+    print(f"📦 {args.products:,} products")
+    index, build_ms = timed(SmartSearch, products)
+    _, save_ms = timed(index.save_snapshot, path, 'benchmark')
+    del index
+    print(f"🔨 build {build_ms:10.1f}ms   save {save_ms:8.1f}ms")
+
+    fresh = SmartSearch()
+    loaded, load_ms = timed(fresh.load_snapshot, path, 'benchmark')
+    _, search_ms = timed(fresh.search, query, 20)
+    _, suggest_ms = timed(fresh.suggest, query[:3])
+    print(f"📂 load  {load_ms:10.1f}ms   first search {search_ms:6.1f}ms   "
+          f"first typeahead {suggest_ms:6.1f}ms (loaded: {loaded})")
+    print(f"🚀 cold start to first search {build_ms / (load_ms + search_ms):.0f}x faster")
+
+    if not args.path:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/listing_projection.py
+"""
+Benchmark listing queries: full Product objects vs listing_rows()
+
+Fills a throwaway SQLite database with a synthetic catalog (names from
+search_benchmark.py, descriptions of 600-2000 characters), then loads
+listing pages and the admin product list both ways. Reports time, bytes
+of column data fetched and peak Python memory per load:
+
+    python benchmarks/listing_projection.py
+    python benchmarks/listing_projection.py --products 200000 --pages 100
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Throwaway database, migrated by init_database(); set before the app is imported
+_tmp = tempfile.mkdtemp()
+# Registered first so it runs last, after the app's own exit handlers
+atexit.register(shutil.rmtree, _tmp, True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'listing.db')}"
+os.environ['SEARCH_SNAPSHOT_DIR'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import event, insert
+from app import app, db, init_database
+from models import Product, listing_rows
+from utils.pagination import keyset_page
+from search_benchmark import make_catalog
+
+
+def fill_catalog(size):
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for product in make_catalog(size):
+        description = product.short_description
+        while len(description) < rng.randint(600, 2000):
+            description += ' ' + product.short_description
+        rows.append({
+            'id': product.id, 'name': product.name, 'description': description,
+            'short_description': product.short_description, 'price': product.price,
+            'compare_price': product.price * 1.2, 'discount': 17, 'image': f'images/p{product.id}.png',
+            'category': product.category, 'brand': product.brand, 'rating': product.rating,
+            'reviews_count': rng.randint(0, 5000), 'stock': 10,
+            'created_at': start + timedelta(minutes=product.id),
+        })
+    Product.query.delete()
+    for chunk in range(0, len(rows), 10_000):
+        db.session.execute(insert(Product), rows[chunk:chunk + 10_000])
+    db.session.commit()
+
+
+def measure(load, repeat):
+    """
+    (ms per load, KiB of column data fetched per load, peak KiB allocated
+    by one load). Timed without tracemalloc, after a warm-up load.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    def run():
+        load()
+        db.session.expunge_all()
+
+    db.session.expunge_all()
+    run()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    tracemalloc.start()
+    try:
+        run()
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    # Run the captured statements again to size what they returned
+    fetched = 0
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql(statement, parameters):
+                fetched += sum(len(str(value)) for value in row if value is not None)
+    return elapsed / repeat, fetched / 1024, peak / 1024
+
+
+def scroll(query, pages):
+    """
+    /products and infinite scroll: the first pages of the newest listing
+    """
+    cursor = None
+    for _ in range(pages):
+        _, cursor = keyset_page(query, 'newest', cursor, app.config['PRODUCTS_PER_PAGE'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark listing column projection')
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--pages', type=int, default=50, help='listing pages scrolled per run')
+    args = parser.parse_args()
+
+    init_database()
+    with app.app_context():
+        fill_catalog(args.products)
+        full = Product.query
+        slim = listing_rows(Product.query)
+        admin_slim = listing_rows(Product.query, Product.category, Product.stock)
+        loads = [
+            (f"{args.pages} listing pages", lambda query: scroll(query, args.pages), 10),
+            ("admin product list", lambda query: query.order_by(Product.created_at.desc()).all(), 3),
+        ]
+
+        print("=" * 60)
+        print(f"📦 {args.products:,} products")
+        for name, load, repeat in loads:
+            slim_query = admin_slim if name.startswith('admin') else slim
+            full_ms, full_kib, full_peak = measure(lambda: load(full), repeat)
+            slim_ms, slim_kib, slim_peak = measure(lambda: load(slim_query), repeat)
+            print(f"📄 {name}")
+            print(f"   products      {full_ms:9.1f}ms {full_kib:10.0f} KiB fetched {full_peak:10.0f} KiB peak")
+            print(f"   listing rows  {slim_ms:9.1f}ms {slim_kib:10.0f} KiB fetched {slim_peak:10.0f} KiB peak")
+            print(f"   🚀 {full_ms / slim_ms:.1f}x faster, {full_kib / slim_kib:.1f}x less data, "
+                  f"{full_peak / slim_peak:.1f}x less memory")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/query_plans.py
+"""
+Check that the hot catalog queries are answered from indexes
+
+Runs the listing, order, review and wishlist queries the way app.py makes
+them against a throwaway in-memory SQLite database built by the migrations,
+EXPLAINs every statement they execute, and exits with status 1 if one
+reads a whole table or sorts rows an index should have ordered. Run it
+next to `flask db check` (models and migrations in sync):
+
+    python benchmarks/query_plans.py
+"""
+import os
+import re
+import sys
+
+# Throwaway database, migrated by init_database(); set before the app is imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['SEARCH_SNAPSHOT_DIR'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import event
+from app import app, db, init_database
+from models import Product, Order, OrderItem, Review, ReviewImage, Wishlist
+from utils.facets import facet_counts
+from utils.pagination import SORT_KEYS, keyset_page
+
+# SQLite prints "SCAN product" for a table scan, "SCAN product USING INDEX ..." for an index walk
+FULL_SCAN = re.compile(r'^SCAN \S+$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def listing(query, sort):
+    """
+    First and second page of a listing, as /products and infinite scroll fetch them
+    """
+    _, cursor = keyset_page(query, sort, per_page=5)
+    keyset_page(query, sort, cursor, per_page=5)
+
+
+def hot_queries(product):
+    """
+    (name, run the query, whether it must be ordered by an index)
+    """
+    by_category = Product.query.filter(Product.category == product.category)
+    by_brand = Product.query.filter(Product.brand == product.brand)
+    queries = []
+    for sort in SORT_KEYS:
+        queries.append((f"/products sort={sort}", lambda sort=sort: listing(Product.query, sort), True))
+        queries.append((f"/products category sort={sort}", lambda sort=sort: listing(by_category, sort), True))
+        # One brand's products are few, sorting them without an index is fine
+        queries.append((f"/products brand sort={sort}", lambda sort=sort: listing(by_brand, sort), False))
+    queries += [
+        ("/products category facets", lambda: facet_counts(by_category), False),
+        ("home latest products", lambda: Product.query.order_by(Product.created_at.desc()).limit(5).all(), True),
+        ("home best sellers", lambda: Product.query.order_by(Product.rating.desc()).limit(5).all(), True),
+        ("related products", lambda: Product.query.filter_by(category=product.category)
+                                         .filter(Product.id != product.id).limit(4).all(), False),
+        ("my orders", lambda: Order.query.filter_by(user_id=1).order_by(Order.created_at.desc()).all(), True),
+        ("admin orders", lambda: Order.query.order_by(Order.created_at.desc()).all(), True),
+        ("order items", lambda: OrderItem.query.filter_by(order_id=1).all(), False),
+        ("product reviews", lambda: Review.query.filter_by(product_id=product.id).all(), False),
+        ("existing review", lambda: Review.query.filter_by(user_id=1, product_id=product.id).first(), False),
+        ("review images", lambda: ReviewImage.query.filter_by(review_id=1).all(), False),
+        ("wishlist page", lambda: Wishlist.query.filter_by(user_id=1)
+                                      .order_by(Wishlist.created_at.desc()).all(), True),
+        ("wishlist check", lambda: Wishlist.query.filter_by(user_id=1, product_id=product.id).first(), False),
+        ("wishlist count", lambda: Wishlist.query.filter_by(user_id=1).count(), False),
+    ]
+    return queries
+
+
+def main():
+    failures = 0
+    init_database()
+    print("=" * 60)
+    with app.app_context():
+        product = Product.query.first()
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        for name, run, must_be_ordered in hot_queries(product):
+            statements.clear()
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            try:
+                run()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', capture)
+
+            problems = []
+            with db.engine.connect() as conn:
+                for statement, parameters in statements:
+                    plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                    problems += [step for step in plan if FULL_SCAN.match(step)]
+                    if must_be_ordered:
+                        problems += [step for step in plan if step == TEMP_SORT]
+            if problems:
+                failures += 1
+                print(f"❌ {name}: {'; '.join(problems)}")
+            else:
+                print(f"✅ {name}")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} hot queries are not served by an index")
+        sys.exit(1)
+    print("✅ Every hot query uses an index")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/related_searches.py
+"""
+Benchmark SearchHistory.get_related_searches with a million logged clicks
+
+Compares the product -> queries posting lists against the old scan over
+every logged query. Runs without the app or a database:
+
+    python benchmarks/related_searches.py [clicks]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.smart_search import SearchHistory
+
+
+def scan_related(search_results, query, limit=5):
+    """The previous implementation: intersect with every other query's clicks"""
+    clicked_products = set(search_results[query])
+    related = Counter()
+    for other_query, products in search_results.items():
+        if other_query == query:
+            continue
+        common = clicked_products.intersection(products)
+        if common:
+            related[other_query] += len(common)
+    return [q for q, _ in related.most_common(limit)]
+
+
+def main(total_clicks=1_000_000, queries=100_000, products=50_000, samples=200):
+    rng = random.Random(42)
+    history = SearchHistory()
+
+    print("=" * 60)
+    print(f"📊 Logging {total_clicks:,} clicks over {queries:,} queries and {products:,} products")
+    start = time.perf_counter()
+    for _ in range(total_clicks):
+        # Skewed like real traffic: a few queries and products get most clicks
+        query = f"query {int(queries * rng.random() ** 3)}"
+        product_id = int(products * rng.random() ** 3) + 1
+        history.log_click(query, product_id)
+    print(f"   logged in {time.perf_counter() - start:.1f}s, "
+          f"{len(history.search_results):,} distinct queries clicked")
+
+    sample = rng.sample(list(history.search_results), min(samples, len(history.search_results)))
+
+    for label, run in (("posting lists", lambda q: history.get_related_searches(q)),
+                       ("full scan", lambda q: scan_related(history.search_results, q))):
+        timings = []
+        for query in sample:
+            start = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"🔍 {label:<14} p50 {timings[len(timings) // 2]:8.3f}ms   "
+              f"p99 {timings[int(len(timings) * 0.99)]:8.3f}ms")
+
+    mismatches = sum(
+        set(history.get_related_searches(q, limit=10 ** 9)) != set(scan_related(history.search_results, q, limit=10 ** 9))
+        for q in sample[:20]
+    )
+    print(f"✅ Same related queries as the full scan for {20 - mismatches}/20 sampled queries")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,186 @@
+# benchmarks/search_benchmark.py
+"""
+Benchmark SmartSearch on synthetic catalogs
+
+For each catalog size this measures index build time, per-query latency
+percentiles for exact, typo'd, multi-word and zero-result queries, and
+peak memory, then writes everything as JSON so runs before and after a
+search change can be compared. Each size runs in its own process so
+peak memory is per catalog. Runs without the app or a database:
+
+    python benchmarks/search_benchmark.py
+    python benchmarks/search_benchmark.py --sizes 1000 10000 --output before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import string
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.smart_search import SmartSearch
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is then reported as null
+    resource = None
+
+CATEGORIES = ['Appliances', 'Home & Kitchen', 'Fashion', 'Sports', 'Beauty', 'Toys', 'Books', 'Furniture',
+              'Bags', 'Mobiles', 'Laptop', 'Watch', 'Men Dresses', 'Woman Dresses', 'Decorations',
+              'Pets care', 'Bathing products', 'Skin care', 'Face care', 'Shoes', 'Mens Accesories',
+              'Women Accesories', 'Gifts', 'Hair care']
+
+QUERY_KINDS = ('exact', 'typo', 'multi_word', 'zero_result')
+
+
+def make_vocabulary(rng, size):
+    """Pronounceable pseudo-words, so typos and prefixes behave like real ones"""
+    consonants = 'bcdfghklmnprstvz'
+    vowels = 'aeiou'
+    words = set()
+    while len(words) < size:
+        syllables = rng.randint(1, 4)
+        words.add(''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(syllables)))
+    return sorted(words)
+
+
+def make_catalog(size, seed=42):
+    """Product-shaped objects with Zipf-like word frequencies"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, max(2000, size // 20))
+    brands = [word.title() for word in vocabulary[:300]]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    products = []
+    for product_id in range(1, size + 1):
+        name_words = rng.choices(vocabulary, weights, k=rng.randint(2, 4))
+        brand = rng.choice(brands)
+        products.append(SimpleNamespace(
+            id=product_id,
+            name=f"{brand} {' '.join(w.title() for w in name_words)} {rng.randint(1, 999)}",
+            category=rng.choice(CATEGORIES),
+            brand=brand,
+            short_description=' '.join(rng.choices(vocabulary, weights, k=rng.randint(6, 15))),
+            rating=round(rng.uniform(3.0, 5.0), 1),
+            price=round(rng.uniform(99, 99999)),
+        ))
+    return products
+
+
+def make_queries(products, count, seed=7):
+    """Distinct queries of each kind, drawn from the catalog itself"""
+    rng = random.Random(seed)
+
+    def typo(word):
+        position = rng.randrange(len(word))
+        edit = rng.choice(('swap', 'drop', 'replace'))
+        if edit == 'swap' and position < len(word) - 1:
+            return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+        if edit == 'drop' and len(word) > 3:
+            return word[:position] + word[position + 1:]
+        return word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+
+    queries = {kind: [] for kind in QUERY_KINDS}
+    for _ in range(count):
+        product = rng.choice(products)
+        name_words = product.name.lower().split()
+        queries['exact'].append(rng.choice(name_words[1:-1]))
+        queries['typo'].append(typo(max(name_words[1:-1], key=len)))
+        queries['multi_word'].append(' '.join(name_words[:rng.randint(2, 3)]))
+        queries['zero_result'].append(''.join(rng.choices('qxjwy', k=rng.randint(5, 9))))
+    return queries
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda fraction: timings[min(len(timings) - 1, int(len(timings) * fraction))]
+    return {
+        'p50_ms': round(pick(0.50), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+    }
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_size(size, query_count):
+    """Benchmark one catalog size; meant to run in a fresh process"""
+    products = make_catalog(size)
+    queries = make_queries(products, query_count)
+
+    start = time.perf_counter()
+    index = SmartSearch(products)
+    build_seconds = time.perf_counter() - start
+
+    latencies = {}
+    for kind in QUERY_KINDS:
+        timings = []
+        for query in queries[kind]:
+            # Measure scoring, not the result cache
+            index._cache.clear()
+            start = time.perf_counter()
+            results, total = index.search(query, limit=20)
+            if total == 0:
+                # /search also looks for a spelling correction
+                index.suggest_corrections(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        latencies[kind] = percentiles(timings)
+
+    return {
+        'products': size,
+        'vocabulary': len(index.postings),
+        'build_seconds': round(build_seconds, 3),
+        'peak_memory_mb': peak_memory_mb(),
+        'queries': latencies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SmartSearch on synthetic catalogs')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=100, help='queries per kind')
+    parser.add_argument('--output', default='search_benchmark.json')
+    args = parser.parse_args()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': [],
+    }
+
+    # A fresh process per size keeps peak memory figures independent
+    context = multiprocessing.get_context('spawn')
+    print("=" * 60)
+    for size in args.sizes:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_size, (size, args.queries))
+        report['results'].append(result)
+        print(f"📦 {size:>9,} products: build {result['build_seconds']:.2f}s, "
+              f"peak {result['peak_memory_mb']} MB, vocabulary {result['vocabulary']:,}")
+        for kind, stats in result['queries'].items():
+            print(f"   🔍 {kind:<12} p50 {stats['p50_ms']:8.2f}ms   p95 {stats['p95_ms']:8.2f}ms   "
+                  f"p99 {stats['p99_ms']:8.2f}ms")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/sharded_search.py
+"""
+Benchmark ShardedSearch against a single in-process SmartSearch
+
+Scores the same synthetic catalog and queries (see search_benchmark.py)
+with 1 in-process index and with N worker shards, result caches off, and
+prints latency percentiles and the speedup. Speedup needs spare cores:
+
+    python benchmarks/sharded_search.py
+    python benchmarks/sharded_search.py --products 1000000 --shards 2 4 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.smart_search import SmartSearch, ShardedSearch
+from search_benchmark import make_catalog, make_queries, percentiles
+
+
+def time_queries(index, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sharded search')
+    parser.add_argument('--products', type=int, default=200_000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--queries', type=int, default=100, help='queries per kind')
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    if not ShardedSearch.supported():
+        print("⚠️ Sharded search needs fork(), nothing to compare")
+        return
+
+    products = make_catalog(args.products)
+    generated = make_queries(products, args.queries)
+    # Zero-result queries never reach scoring, so leave them out
+    queries = generated['exact'] + generated['typo'] + generated['multi_word']
+
+    print("=" * 60)
+    print(f"📦 {args.products:,} products, {len(queries)} queries, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    single = SmartSearch(products, cache_size=0)
+    build_seconds = time.perf_counter() - start
+    baseline = time_queries(single, queries)
+    del single
+    results = [{'shards': 1, 'build_seconds': round(build_seconds, 3), 'queries': baseline}]
+    print(f"🔍 in-process   build {build_seconds:6.2f}s   p50 {baseline['p50_ms']:8.2f}ms   "
+          f"p95 {baseline['p95_ms']:8.2f}ms")
+
+    for shards in args.shards:
+        start = time.perf_counter()
+        index = ShardedSearch(shards, products, cache_size=0)
+        build_seconds = time.perf_counter() - start
+        stats = time_queries(index, queries)
+        index.close()
+        speedup = baseline['p50_ms'] / stats['p50_ms']
+        results.append({'shards': shards, 'build_seconds': round(build_seconds, 3),
+                        'queries': stats, 'p50_speedup': round(speedup, 2)})
+        print(f"🔍 {shards:2} shards    build {build_seconds:6.2f}s   p50 {stats['p50_ms']:8.2f}ms   "
+              f"p95 {stats['p95_ms']:8.2f}ms   {speedup:.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'products': args.products, 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
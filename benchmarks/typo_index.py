@@ -0,0 +1,92 @@
+# benchmarks/typo_index.py
+"""
+Check that the typo index finds what a full vocabulary scan finds
+
+SmartSearch resolves query words through its term, bigram and delete
+indexes instead of comparing them with every vocabulary word. On a fixed
+synthetic catalog this resolves exact, typo'd, multi-word, zero-result
+and punctuation queries both ways, with the same rules as match_terms()
+but by scanning the whole vocabulary with SequenceMatcher, then ranks
+each query with both expansions. It exits with status 1 if any query
+word expands differently or any query returns other ids or scores.
+Runs without the app or a database:
+
+    python benchmarks/typo_index.py
+    python benchmarks/typo_index.py --products 5000 --queries 200
+"""
+import argparse
+import os
+import re
+import sys
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search_benchmark import make_catalog, make_queries
+from utils.smart_search import SIMILARITY_CUTOFF, SYNONYM_WEIGHT, SmartSearch, stem
+
+# Edge cases the synthetic queries don't produce
+EXTRA_QUERIES = ['+', '  ', 'a', 'ka', 'Ka-Ba', 'phone', 'mobiles', 'tv', 'x' * 40]
+
+
+def scanned_matches(index, vocabulary, q_word):
+    """
+    match_terms() of q_word, worked out by scanning every vocabulary word
+    """
+    q_stem = stem(q_word)
+    q_term = index.term(q_word)
+    matches = {word: 1.0 if stem(word) == q_stem else SYNONYM_WEIGHT
+               for word in vocabulary if index.term(word) == q_term}
+    if not matches:
+        for word in vocabulary:
+            similarity = SequenceMatcher(None, q_word, word).ratio()
+            if similarity > SIMILARITY_CUTOFF:
+                matches[word] = similarity
+    for word in vocabulary:
+        if q_word in word:
+            coverage = len(q_word) / len(word)
+            if coverage > matches.get(word, 0.0):
+                matches[word] = coverage
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the typo index against a full vocabulary scan')
+    parser.add_argument('--products', type=int, default=1500)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    products = make_catalog(args.products)
+    queries = make_queries(products, args.queries)
+    queries['extra'] = EXTRA_QUERIES
+    index = SmartSearch(products)
+    # A second index without a result cache, ranking with the scanned expansions
+    reference = SmartSearch(products, cache_size=0)
+    vocabulary = index.vocabulary()
+
+    print("=" * 60)
+    print(f"🔍 {len(products):,} products, {len(vocabulary):,} vocabulary words")
+    failures = 0
+    for kind, kind_queries in queries.items():
+        checked = 0
+        for query in kind_queries:
+            query_words = list(dict.fromkeys(re.findall(r'\w+', index.normalize_query(query))))
+            expected = {q_word: scanned_matches(index, vocabulary, q_word) for q_word in query_words}
+            if index.expand(query_words) != expected:
+                failures += 1
+                print(f"❌ {kind} {query!r}: expansions differ from the vocabulary scan")
+                continue
+            if index.search(query) != reference.search(query, expansions=expected):
+                failures += 1
+                print(f"❌ {kind} {query!r}: ranking differs from the vocabulary scan")
+                continue
+            checked += 1
+        print(f"   {kind:12} {checked:4}/{len(kind_queries)} match")
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} queries differ")
+        sys.exit(1)
+    print("✅ Typo index matches the full vocabulary scan")
+
+
+if __name__ == '__main__':
+    main()
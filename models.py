@@ -2,6 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from collections import Counter
+from sqlalchemy import event, false, func, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
 
 db = SQLAlchemy()
 
@@ -36,6 +40,19 @@ class Product(db.Model):
     stock = db.Column(db.Integer, default=10)
     featured = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Last change to the row; the Last-Modified and ETag of product responses
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Listings filter by category or brand and page in (sort column, id) order
+    __table_args__ = (
+        db.Index('ix_product_created_at', 'created_at', 'id'),
+        db.Index('ix_product_price', 'price', 'id'),
+        db.Index('ix_product_rating', 'rating', 'id'),
+        db.Index('ix_product_category_created_at', 'category', 'created_at', 'id'),
+        db.Index('ix_product_category_price', 'category', 'price', 'id'),
+        db.Index('ix_product_category_rating', 'category', 'rating', 'id'),
+        db.Index('ix_product_brand_created_at', 'brand', 'created_at', 'id'),
+    )
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -65,10 +82,16 @@ class Order(db.Model):
     # >>>>>>>>>> END OF NEW FIELDS <<<<<<<<<<
 
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    
+    # "My orders" (newest first) and the admin order list
+    __table_args__ = (
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_order_created_at', 'created_at'),
+    )
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     product_name = db.Column(db.String(200), nullable=False)
     price = db.Column(db.Float, nullable=False)
@@ -89,10 +112,13 @@ class Review(db.Model):
     user = db.relationship('User', backref='user_reviews')
     product = db.relationship('Product', backref='product_reviews')
     images = db.relationship('ReviewImage', backref='review_images', cascade='all, delete-orphan')
+    
+    # A product's reviews, and whether a user already reviewed it
+    __table_args__ = (db.Index('ix_review_product_id_user_id', 'product_id', 'user_id'),)
 
 class ReviewImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False)
+    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False, index=True)
     image_url = db.Column(db.String(300), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -105,4 +131,136 @@ class Wishlist(db.Model):
     user = db.relationship('User', backref='wishlist_items')
     product = db.relationship('Product', backref='wishlist_users')
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='unique_wishlist'),)
\ No newline at end of file
+    # The unique constraint's index also serves lookups by user_id alone
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='unique_wishlist'),
+                      db.Index('ix_wishlist_user_id_created_at', 'user_id', 'created_at'))
+
+class SearchQuery(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(200), unique=True, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    results_count = db.Column(db.Integer, default=0)
+    last_searched = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SearchClick(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(200), nullable=False)
+    # No foreign key: click history outlives deleted products
+    product_id = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    last_clicked = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('term', 'product_id', name='unique_search_click'),)
+
+class CatalogVersion(db.Model):
+    # Single row, bumped by every flush that adds, changes or deletes a product
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class Category(db.Model):
+    # One row per product category; product_count is kept by count_category_products.
+    # Listed categories make up the navigation and the admin form choices, by position.
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    listed = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
+
+@event.listens_for(Session, 'before_flush')
+def count_category_products(session, flush_context, instances):
+    # Before the flush, while deleted products and old categories are still readable
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Product):
+            deltas[obj.category] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            deltas[obj.category] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Product) and obj not in session.deleted:
+            added, _, removed = get_history(obj, 'category')
+            if added and not removed:
+                # Set without being loaded first; the stored value is the old one
+                removed = [session.connection().execute(
+                    select(Product.category).where(Product.id == obj.id)).scalar()]
+            for name in added:
+                deltas[name] += 1
+            for name in removed:
+                deltas[name] -= 1
+    deltas = {name: delta for name, delta in deltas.items() if name and delta}
+    if not deltas:
+        return
+    table = Category.__table__
+    conn = session.connection()
+    for name, delta in deltas.items():
+        counted = update(table).where(table.c.name == name).values(product_count=table.c.product_count + delta)
+        if not conn.execute(counted).rowcount:
+            # A category first used by a product gets an unlisted row at the end, for its count
+            position = conn.execute(select(func.coalesce(func.max(table.c.position), 0) + 1)).scalar()
+            conn.execute(insert(table).values(name=name, position=position, product_count=max(delta, 0)))
+
+@event.listens_for(Session, 'after_flush')
+def bump_catalog_version(session, flush_context):
+    changed = (any(isinstance(obj, Product) for obj in session.new) or
+               any(isinstance(obj, Product) for obj in session.deleted) or
+               any(isinstance(obj, Product) and session.is_modified(obj) for obj in session.dirty))
+    if not changed:
+        return
+    table = CatalogVersion.__table__
+    conn = session.connection()
+    if not conn.execute(update(table).values(version=table.c.version + 1)).rowcount:
+        conn.execute(insert(table).values(id=1, version=1))
+    # The counter row stays locked until commit, so no other change lands in between
+    version = conn.execute(select(table.c.version)).scalar()
+    before, _ = session.info.get('catalog_revisions', (version - 1, None))
+    session.info['catalog_revisions'] = (before, version)
+
+# Called with no arguments after a commit that changed products, to drop in-process caches
+catalog_listeners = []
+
+# Called with the revisions before and after such a commit, for in-process
+# state the committing code updates itself (the search index)
+catalog_revision_listeners = []
+
+@event.listens_for(Session, 'after_commit')
+def notify_catalog_listeners(session):
+    revisions = session.info.pop('catalog_revisions', None)
+    if revisions:
+        for listener in catalog_listeners:
+            listener()
+        for listener in catalog_revision_listeners:
+            listener(*revisions)
+
+@event.listens_for(Session, 'after_rollback')
+def forget_catalog_changes(session):
+    session.info.pop('catalog_revisions', None)
+
+def catalog_revision():
+    """
+    The CatalogVersion counter alone: a single-row read, cheap enough for
+    every request and for polling other processes' changes
+    """
+    return db.session.query(CatalogVersion.version).scalar() or 0
+
+def catalog_version():
+    """
+    Tag identifying the current catalog: "version:product count:highest id".
+    Count and id catch a recreated database whose counter started over.
+    """
+    version = catalog_revision()
+    count, max_id = db.session.query(func.count(Product.id), func.max(Product.id)).one()
+    return f"{version}:{count}:{max_id or 0}"
+
+# Columns product cards read, plus created_at for the listing cursors;
+# description and the other detail-page columns are never fetched
+LISTING_COLUMNS = ('id', 'name', 'price', 'compare_price', 'discount', 'image', 'rating', 'reviews_count',
+                   'created_at')
+
+def listing_rows(query, *extra):
+    """
+    A Product query narrowed to the listing read model: rows with the
+    LISTING_COLUMNS and any extra columns as attributes, not Product objects.
+    Plain rows skip the ORM identity map, so they are cheaper to load than
+    deferred columns and safe to cache and share between threads.
+    """
+    return query.with_entities(*[getattr(Product, name) for name in LISTING_COLUMNS], *extra)
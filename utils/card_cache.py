@@ -0,0 +1,89 @@
+# utils/card_cache.py
+"""
+Rendered product card cache for Triowise listings
+Each card is rendered once per product version and reused by every
+listing page, filter and scroll request until its fields change. The
+shopper's wishlist hearts are applied by picking the card's wishlisted
+variant, so a page of cached cards is a single string join.
+"""
+
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+
+from markupsafe import Markup
+from sqlalchemy.engine import Row
+
+CARD_TEMPLATE = 'includes/product_card.html'
+
+# Filled in per shopper: rendered once with markers, stored with both fillings
+WISHLIST_CLASS = '\x00wishlist-class\x00'
+HEART_STYLE = '\x00heart-style\x00'
+
+
+class CardCache:
+    """
+    LRU of rendered cards: product id -> (card field values, plain HTML,
+    wishlisted HTML). The field values are the version: a card whose
+    product changed any of them misses and is rendered again.
+    """
+
+    def __init__(self, app, size=5000):
+        self.app = app
+        self.size = size
+        self._cards = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render_cards(self, products, wishlist_ids=()):
+        """
+        HTML of the cards for products (Product objects or listing rows),
+        hearts filled for the ids in wishlist_ids
+        """
+        from models import LISTING_COLUMNS
+
+        # Listing rows are their own version; attribute access on them is comparatively slow
+        card_fields = attrgetter(*LISTING_COLUMNS)
+        wishlist_ids = set(wishlist_ids or ())
+        html = []
+        missing = []
+        with self._lock:
+            for product in products:
+                values = tuple(product) if isinstance(product, Row) else card_fields(product)
+                entry = self._cards.get(product.id)
+                if entry is None or entry[0] != values:
+                    missing.append((len(html), product, values))
+                    html.append(None)
+                    continue
+                self._cards.move_to_end(product.id)
+                html.append(entry[2] if product.id in wishlist_ids else entry[1])
+
+        # Render misses outside the lock; two requests missing the same card both render it
+        rendered = []
+        if missing:
+            card = self.app.jinja_env.get_template(CARD_TEMPLATE).module.product_card
+        for position, product, values in missing:
+            entry = self._render(card, product, values)
+            rendered.append((product.id, entry))
+            html[position] = entry[2] if product.id in wishlist_ids else entry[1]
+        if rendered:
+            with self._lock:
+                for product_id, entry in rendered:
+                    self._cards[product_id] = entry
+                    self._cards.move_to_end(product_id)
+                while len(self._cards) > self.size:
+                    self._cards.popitem(last=False)
+        return Markup(''.join(html))
+
+    def clear(self):
+        with self._lock:
+            self._cards.clear()
+
+    @staticmethod
+    def _render(card, product, values):
+        """
+        Cache entry of one card: rendered by the card macro with markers, then both heart states
+        """
+        marked = str(card(product, WISHLIST_CLASS, HEART_STYLE))
+        plain = marked.replace(WISHLIST_CLASS, '').replace(HEART_STYLE, 'regular')
+        wishlisted = marked.replace(WISHLIST_CLASS, 'active').replace(HEART_STYLE, 'solid')
+        return values, plain, wishlisted
@@ -0,0 +1,36 @@
+# utils/categories.py
+"""
+Product categories for Triowise navigation and admin forms
+Read from the small Category table, whose product counts are kept up to
+date on every product write, and cached in-process between changes.
+Navigation and the admin forms offer the listed categories; other
+categories products use are counted but not listed.
+"""
+
+import time
+
+# Seconds before another process's category changes are picked up;
+# changes committed in this process clear the cache at once
+CACHE_TTL = 60
+
+_cache = {'counts': None, 'loaded_at': 0.0}
+
+
+def category_navigation():
+    """
+    {category name: product count} of the listed categories, in navigation order
+    """
+    from models import db, Category
+
+    counts = _cache['counts']
+    if counts is None or time.monotonic() - _cache['loaded_at'] >= CACHE_TTL:
+        rows = (db.session.query(Category.name, Category.product_count)
+                .filter(Category.listed)
+                .order_by(Category.position, Category.id))
+        counts = dict(rows.all())
+        _cache['counts'], _cache['loaded_at'] = counts, time.monotonic()
+    return counts
+
+
+def clear_category_cache():
+    _cache['counts'] = None
@@ -0,0 +1,100 @@
+# utils/facets.py
+"""
+Faceted counts for Triowise search and listing pages
+Category, brand, price-bucket and rating counts for a set of matching products
+"""
+
+from collections import Counter
+
+# Upper bounds of the price buckets; the last bucket is open-ended
+PRICE_EDGES = (500, 1000, 5000, 20000, 50000)
+
+# Star thresholds shown as "4★ & above" and so on
+RATING_STARS = (4, 3, 2, 1)
+
+
+def price_bucket_label(bucket):
+    """
+    Display label of a price bucket index
+    """
+    if bucket == 0:
+        return f'Under ₹{PRICE_EDGES[0]:,}'
+    if bucket == len(PRICE_EDGES):
+        return f'₹{PRICE_EDGES[-1]:,} & above'
+    return f'₹{PRICE_EDGES[bucket - 1]:,} - ₹{PRICE_EDGES[bucket]:,}'
+
+
+def build_facets(categories, brands, prices, ratings):
+    """
+    Facet lists for templates and JSON from raw counts.
+
+    categories and brands count products per value, prices per bucket
+    index and ratings per whole star (a 4.6 rating counts under 4).
+    """
+    def by_count(counts):
+        return [{'value': value, 'count': count}
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+                if value and count]
+
+    price_facets = []
+    for bucket in range(len(PRICE_EDGES) + 1):
+        if prices.get(bucket):
+            price_facets.append({
+                'value': bucket,
+                'label': price_bucket_label(bucket),
+                'min_price': PRICE_EDGES[bucket - 1] if bucket else None,
+                'max_price': PRICE_EDGES[bucket] if bucket < len(PRICE_EDGES) else None,
+                'count': prices[bucket]
+            })
+
+    rating_facets = []
+    for stars in RATING_STARS:
+        count = sum(n for floor, n in ratings.items() if floor >= stars)
+        rating_facets.append({'value': stars, 'label': f'{stars}★ & above', 'count': count})
+
+    return {
+        'category': by_count(categories),
+        'brand': by_count(brands),
+        'price': price_facets,
+        'rating': rating_facets
+    }
+
+
+def facet_counts(query, brand_query=None):
+    """
+    Facets for a filtered Product query, counted in a single GROUP BY.
+    brand_query is the same query without its brand filter, if it has
+    one: brand counts come from it (one more GROUP BY) so the sidebar
+    keeps offering the other brands.
+    """
+    from sqlalchemy import case, func, literal_column
+    from models import Product
+
+    # Literal thresholds keep the CASE text identical in SELECT and GROUP BY
+    price_bucket = case(
+        *[(Product.price < literal_column(str(edge)), literal_column(str(bucket)))
+          for bucket, edge in enumerate(PRICE_EDGES)],
+        else_=literal_column(str(len(PRICE_EDGES)))
+    )
+    rating_floor = case(
+        *[(Product.rating >= literal_column(str(stars)), literal_column(str(stars)))
+          for stars in (5,) + RATING_STARS],
+        else_=literal_column('0')
+    )
+    rows = (query.order_by(None)
+            .with_entities(Product.category, Product.brand, price_bucket, rating_floor, func.count(Product.id))
+            .group_by(Product.category, Product.brand, price_bucket, rating_floor)
+            .all())
+
+    categories, brands, prices, ratings = Counter(), Counter(), Counter(), Counter()
+    for category, brand, bucket, floor, count in rows:
+        categories[category] += count
+        brands[brand] += count
+        prices[bucket] += count
+        ratings[floor] += count
+    if brand_query is not None:
+        brands = Counter(dict(brand_query.order_by(None)
+                              .with_entities(Product.brand, func.count(Product.id))
+                              .group_by(Product.brand)
+                              .all()))
+    return build_facets(categories, brands, prices, ratings)
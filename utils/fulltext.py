@@ -0,0 +1,157 @@
+# utils/fulltext.py
+"""
+Database full-text search backend for Triowise
+SQLite uses an FTS5 table, PostgreSQL a weighted tsvector column with a GIN index
+"""
+
+import re
+from collections import Counter
+from sqlalchemy import column, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+# Rank with the same field weights as the in-memory index
+from utils.smart_search import FIELD_BOOSTS
+from utils.facets import build_facets, facet_counts
+
+_SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE product_fts USING fts5(
+        name, category, brand, short_description,
+        content='product', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, category, brand, short_description)
+        VALUES (new.id, new.name, new.category, new.brand, new.short_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, category, brand, short_description)
+        VALUES ('delete', old.id, old.name, old.category, old.brand, old.short_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, category, brand, short_description)
+        VALUES ('delete', old.id, old.name, old.category, old.brand, old.short_description);
+        INSERT INTO product_fts(rowid, name, category, brand, short_description)
+        VALUES (new.id, new.name, new.category, new.brand, new.short_description);
+    END""",
+    # Index the rows that existed before the table was created
+    "INSERT INTO product_fts(product_fts) VALUES ('rebuild')",
+]
+
+# Name is weight A, category and brand B, description C
+_POSTGRES_SETUP = [
+    """ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(category, '') || ' ' || coalesce(brand, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(short_description, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING GIN (search_vector)",
+]
+
+
+def migration_include_object(object, name, type_, reflected, compare_to):
+    """
+    Migration autogenerate filter: the full-text structures are created by
+    setup_fulltext(), not by the models, so never propose dropping them
+    """
+    if type_ == 'table' and name.startswith('product_fts'):
+        return False
+    if name in ('search_vector', 'ix_product_search_vector'):
+        return False
+    return True
+
+
+def setup_fulltext(db):
+    """
+    Create the full-text structures for the current database.
+    Returns False when the database cannot do full-text search.
+    """
+    dialect = db.engine.dialect.name
+    try:
+        with db.engine.begin() as conn:
+            if dialect == 'sqlite':
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+                )).first()
+                if not exists:
+                    for statement in _SQLITE_SETUP:
+                        conn.execute(text(statement))
+            elif dialect == 'postgresql':
+                for statement in _POSTGRES_SETUP:
+                    conn.execute(text(statement))
+            else:
+                return False
+    except (OperationalError, ProgrammingError) as e:
+        print(f"⚠️ Full-text search unavailable: {e}")
+        return False
+    return True
+
+
+def fulltext_search(db, query, limit, offset=0):
+    """
+    Rank matching products in the database.
+    Returns (page of product ids, total number of matches).
+    """
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return [], 0
+
+    match = _match(db, words)
+    if db.engine.dialect.name == 'sqlite':
+        weights = ', '.join(str(FIELD_BOOSTS[f]) for f in ('name', 'category', 'brand', 'description'))
+        # bm25() is lower-is-better; rating breaks ties like the popularity bonus
+        rows = db.session.execute(text(f"""
+            SELECT product.id FROM product_fts
+            JOIN product ON product.id = product_fts.rowid
+            WHERE product_fts MATCH :match
+            ORDER BY bm25(product_fts, {weights}), product.rating DESC
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'limit': limit, 'offset': offset})
+        ids = [row[0] for row in rows]
+        total = db.session.execute(text(
+            "SELECT count(*) FROM product_fts WHERE product_fts MATCH :match"
+        ), {'match': match}).scalar()
+    else:
+        # ts_rank weights are ordered {D, C, B, A}, scaled so name = 1.0
+        name_weight = FIELD_BOOSTS['name']
+        weights = '{0.1, %s, %s, 1.0}' % (FIELD_BOOSTS['description'] / name_weight,
+                                         FIELD_BOOSTS['category'] / name_weight)
+        rows = db.session.execute(text("""
+            SELECT id FROM product
+            WHERE search_vector @@ to_tsquery('simple', :match)
+            ORDER BY ts_rank(CAST(:weights AS real[]), search_vector, to_tsquery('simple', :match)) DESC,
+                     rating DESC NULLS LAST
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'weights': weights, 'limit': limit, 'offset': offset})
+        ids = [row[0] for row in rows]
+        total = db.session.execute(text(
+            "SELECT count(*) FROM product WHERE search_vector @@ to_tsquery('simple', :match)"
+        ), {'match': match}).scalar()
+
+    return ids, total
+
+
+def fulltext_facets(db, query):
+    """
+    Category, brand, price and rating counts over every product matching a query
+    """
+    from models import Product
+
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return build_facets(Counter(), Counter(), Counter(), Counter())
+
+    if db.engine.dialect.name == 'sqlite':
+        matching = text("SELECT rowid FROM product_fts WHERE product_fts MATCH :match")
+    else:
+        matching = text("SELECT id FROM product WHERE search_vector @@ to_tsquery('simple', :match)")
+    matching = matching.bindparams(match=_match(db, words)).columns(column('id'))
+    return facet_counts(Product.query.filter(Product.id.in_(matching)))
+
+
+def _match(db, words):
+    """
+    Full-text query string that prefix matches any of the words
+    """
+    if db.engine.dialect.name == 'sqlite':
+        return ' OR '.join(f'"{word}"*' for word in words)
+    return ' | '.join(f'{word}:*' for word in words)
@@ -0,0 +1,107 @@
+# utils/home_cache.py
+"""
+Cached home page blocks for Triowise
+Latest products, best sellers and the product count, kept per catalog
+version. Requests never wait on the database once the cache is warm: past
+the TTL they get the cached blocks while one background thread checks the
+catalog version and reloads the blocks if it moved.
+"""
+
+import threading
+import time
+
+# Products in each home page block
+BLOCK_SIZE = 5
+
+
+def load_home_blocks(version):
+    """
+    Home page blocks for the current catalog
+    """
+    from sqlalchemy import func
+    from models import db, Product, listing_rows
+
+    # Plain rows with the card fields, shared by every request until the catalog changes
+    cards = listing_rows(Product.query)
+    latest = cards.order_by(Product.created_at.desc()).limit(BLOCK_SIZE).all()
+    best_sellers = cards.order_by(Product.rating.desc()).limit(BLOCK_SIZE).all()
+    total = db.session.query(func.count(Product.id)).scalar()
+    return {
+        'version': version,
+        'latest_products': latest,
+        'best_seller_products': best_sellers,
+        'total_products': total,
+    }
+
+
+class HomeCache:
+    """
+    Stale-while-revalidate cache of the home page blocks.
+
+    Blocks older than ttl seconds are still served, and the first request
+    to see them stale starts the refresh. Committing a product change in
+    this process marks the blocks stale at once; other processes notice
+    the new catalog version within ttl.
+    """
+
+    def __init__(self, app, ttl=60):
+        self.app = app
+        self.ttl = ttl
+        self._blocks = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._stale_marks = 0
+        self._lock = threading.Lock()
+        from models import catalog_listeners
+        catalog_listeners.append(self.mark_stale)
+
+    def get(self):
+        """
+        Home page blocks; loads them in the request only on a cold cache
+        """
+        blocks = self._blocks
+        if blocks is None:
+            with self._lock:
+                if self._blocks is None:
+                    self._load()
+                return self._blocks
+        if time.monotonic() - self._checked_at >= self.ttl:
+            self._start_refresh()
+        return blocks
+
+    def mark_stale(self):
+        self._stale_marks += 1
+        self._checked_at = 0.0
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='home-cache-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._load()
+        except Exception as e:
+            # Keep serving the old blocks; the next stale request retries
+            print(f"⚠️ Home page cache refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def _load(self):
+        """
+        Reload the blocks if the catalog version moved. Runs in its own app
+        context, with a session of its own, from a request or the refresh thread.
+        """
+        from models import catalog_version
+
+        marks = self._stale_marks
+        with self.app.app_context():
+            version = catalog_version()
+            current = self._blocks
+            if current is None or current['version'] != version:
+                self._blocks = load_home_blocks(version)
+        # A commit during the load may not be in these blocks; leave them stale
+        if marks == self._stale_marks:
+            self._checked_at = time.monotonic()
@@ -0,0 +1,76 @@
+# utils/http_cache.py
+"""
+Conditional GET for Triowise pages and APIs
+Responses carry an ETag (and Last-Modified where there is one) built from
+what they were rendered from. A client that sends it back with
+If-None-Match gets an empty 304 without the page being rendered again.
+"""
+
+import hashlib
+from datetime import timezone
+
+
+def make_etag(*parts):
+    """
+    ETag value for a response built from parts (anything with a stable repr)
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def viewer_state():
+    """
+    What every page shows about the current visitor besides the catalog:
+    account, wishlist hearts and the cart count
+    """
+    from flask import session
+    from flask_login import current_user
+
+    if current_user.is_authenticated:
+        # The same relationship base.html counts, loaded once per request
+        wishlist = sorted(item.product_id for item in current_user.wishlist_items)
+        user = (current_user.id, current_user.name, current_user.role, tuple(wishlist))
+    else:
+        user = None
+    return user, len(session.get('cart', []))
+
+
+def _http_date(last_modified):
+    # HTTP dates have whole seconds; naive datetimes here are UTC
+    return last_modified.replace(microsecond=0, tzinfo=last_modified.tzinfo or timezone.utc)
+
+
+def not_modified(etag, last_modified=None, private=False):
+    """
+    An empty 304 response if the request already has this version, else
+    None. Call it before doing the work the response needs.
+    """
+    from flask import current_app, request
+
+    if request.if_none_match:
+        unchanged = request.if_none_match.contains_weak(etag)
+    else:
+        unchanged = (last_modified is not None and request.if_modified_since is not None
+                     and _http_date(last_modified) <= request.if_modified_since)
+    if not unchanged:
+        return None
+    return with_validators(current_app.response_class(status=304), etag, last_modified, private)
+
+
+def with_validators(response, etag, last_modified=None, private=False):
+    """
+    Response (or anything a view may return) with its ETag and Last-Modified.
+    Pages that differ per visitor are private and vary on the session
+    cookie; all are revalidated on every use (no-cache).
+    """
+    from flask import make_response
+
+    response = make_response(response)
+    # Weak: the tag stands for what the body was built from, not its exact bytes
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Cookie')
+    return response
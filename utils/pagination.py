@@ -0,0 +1,94 @@
+# utils/pagination.py
+"""
+Keyset (cursor) pagination for Triowise product listings
+A page continues after the last product of the previous one instead of
+skipping rows with OFFSET, so page 50 costs the same as page 1
+"""
+
+import base64
+import json
+from datetime import datetime
+
+# Listing sort -> (Product column, descending); product id breaks ties
+SORT_KEYS = {
+    'newest': ('created_at', True),
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+    'rating': ('rating', True),
+}
+
+
+def encode_cursor(sort, product):
+    """
+    Opaque cursor pointing just after a product in the given sort order
+    """
+    column, _ = SORT_KEYS[sort]
+    value = getattr(product, column)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([sort, value, product.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """
+    (sort value, product id) from a cursor, or None when it is missing,
+    malformed or was made for another sort order
+    """
+    if not cursor:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, product_id = json.loads(data)
+        if cursor_sort != sort or not isinstance(product_id, int):
+            return None
+        if value is not None and SORT_KEYS[sort][0] == 'created_at':
+            value = datetime.fromisoformat(value)
+        return value, product_id
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(query, sort, cursor=None, per_page=24):
+    """
+    One page of a Product query in a listing sort order, starting after
+    cursor. Returns (products, cursor of the next page or None).
+
+    Products with a value come first, continuing after the cursor's
+    (value, id) with a row-value comparison an index on (column, id)
+    answers with a range scan. Products missing the value follow, by id,
+    the same on SQLite and PostgreSQL.
+    """
+    from sqlalchemy import tuple_
+    from models import Product
+
+    if sort not in SORT_KEYS:
+        sort = 'newest'
+    column_name, descending = SORT_KEYS[sort]
+    column = getattr(Product, column_name)
+    query = query.order_by(None)
+    position = decode_cursor(cursor, sort)
+
+    def after(left, right):
+        return left < right if descending else left > right
+
+    def in_order(query, *columns):
+        return query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+
+    # One extra row tells whether there is a next page
+    products = []
+    if position is None or position[0] is not None:
+        page = query.filter(column.isnot(None))
+        if position is not None:
+            page = page.filter(after(tuple_(column, Product.id), position))
+        products = in_order(page, column, Product.id).limit(per_page + 1).all()
+    if len(products) <= per_page and Product.__table__.c[column_name].nullable:
+        tail = query.filter(column.is_(None))
+        if position is not None and position[0] is None:
+            tail = tail.filter(after(Product.id, position[1]))
+        products += in_order(tail, Product.id).limit(per_page + 1 - len(products)).all()
+
+    if len(products) <= per_page:
+        return products, None
+    products = products[:per_page]
+    return products, encode_cursor(sort, products[-1])
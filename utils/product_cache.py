@@ -0,0 +1,226 @@
+# utils/product_cache.py
+"""
+Read-through product cache for Triowise
+Product pages, quick view and the cart look products up by id on every
+request. The cache keeps each product's column values, in-process (LRU
+with a TTL) or in a Redis-protocol server shared by every worker, and
+the routes that change a product invalidate it.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+@lru_cache(maxsize=1)
+def _datetime_columns():
+    from models import db, Product
+    return tuple(column.name for column in Product.__table__.columns if isinstance(column.type, db.DateTime))
+
+
+class MemoryBackend:
+    """
+    LRU of product id -> (expiry time, column values), local to the process
+    """
+
+    name = 'memory'
+
+    def __init__(self, size=10000, ttl=300):
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        with self._lock:
+            item = self._items.get(product_id)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[product_id]
+                return None
+            self._items.move_to_end(product_id)
+            return item[1]
+
+    def get_many(self, product_ids):
+        return [self.get(product_id) for product_id in product_ids]
+
+    def set(self, product_id, values):
+        with self._lock:
+            self._items[product_id] = (time.monotonic() + self.ttl, values)
+            self._items.move_to_end(product_id)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, product_id):
+        with self._lock:
+            self._items.pop(product_id, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RedisBackend:
+    """
+    Products as JSON under "product:<id>" with the TTL as expiry, in a
+    Redis-protocol server (Redis, Valkey, KeyDB, ...) shared by all workers
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, ttl=300, prefix='product:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, product_id):
+        data = self.client.get(f"{self.prefix}{product_id}")
+        return None if data is None else json.loads(data)
+
+    def get_many(self, product_ids):
+        if not product_ids:
+            return []
+        found = self.client.mget([f"{self.prefix}{product_id}" for product_id in product_ids])
+        return [None if data is None else json.loads(data) for data in found]
+
+    def set(self, product_id, values):
+        self.client.setex(f"{self.prefix}{product_id}", self.ttl, json.dumps(values))
+
+    def delete(self, product_id):
+        self.client.delete(f"{self.prefix}{product_id}")
+
+    def __len__(self):
+        # Keys only this cache writes; a scan is fine for a metrics scrape
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}*", count=1000))
+
+
+class ProductCache:
+    """
+    Products by id, loaded from the database on a miss. Lookups return
+    read-only copies of the product's columns, not session objects: routes
+    that change a product load it with db.session.get and call invalidate.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, url=None, size=10000, ttl=300):
+        """
+        Redis-backed when url is set and the redis package is installed, else in-process
+        """
+        if url:
+            try:
+                return cls(RedisBackend(url, ttl=ttl))
+            except ImportError:
+                print("⚠️ redis not installed, using an in-process product cache")
+        return cls(MemoryBackend(size=size, ttl=ttl))
+
+    def get(self, product_id):
+        """
+        Product with this id as a read-only namespace, or None
+        """
+        values = self._cached(product_id)
+        if values is None:
+            self.misses += 1
+            values = self._load(product_id)
+            if values is None:
+                return None
+            self._store(product_id, values)
+        else:
+            self.hits += 1
+        return self._product(values)
+
+    def get_many(self, product_ids):
+        """
+        {id: product} for the ids that exist; misses are read in one IN query
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        try:
+            cached = self.backend.get_many(product_ids)
+        except Exception:
+            self.errors += 1
+            cached = [None] * len(product_ids)
+        found = {product_id: values for product_id, values in zip(product_ids, cached) if values is not None}
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+        for product_id, values in self._load_many(missing).items():
+            self._store(product_id, values)
+            found[product_id] = values
+        return {product_id: self._product(values) for product_id, values in found.items()}
+
+    def get_or_404(self, product_id):
+        from flask import abort
+
+        product = self.get(product_id)
+        if product is None:
+            abort(404)
+        return product
+
+    def invalidate(self, product_id):
+        self.invalidations += 1
+        try:
+            self.backend.delete(product_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Product cache invalidation failed for {product_id}: {e}")
+
+    def stats(self):
+        try:
+            size = len(self.backend)
+        except Exception:
+            size = -1
+        return {'backend': self.backend.name, 'hits': self.hits, 'misses': self.misses,
+                'invalidations': self.invalidations, 'errors': self.errors, 'size': size}
+
+    def _cached(self, product_id):
+        # A cache server that is down means a database read, not a failed request
+        try:
+            return self.backend.get(product_id)
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _store(self, product_id, values):
+        try:
+            self.backend.set(product_id, values)
+        except Exception:
+            self.errors += 1
+
+    @staticmethod
+    def _load(product_id):
+        return ProductCache._load_many([product_id]).get(product_id)
+
+    @staticmethod
+    def _load_many(product_ids):
+        """
+        {id: column values} JSON-ready (datetimes as ISO strings), in one query
+        """
+        from models import db, Product
+
+        if not product_ids:
+            return {}
+        rows = db.session.query(*Product.__table__.columns).filter(Product.id.in_(product_ids)).all()
+        return {row.id: {name: value.isoformat() if isinstance(value, datetime) else value
+                         for name, value in row._mapping.items()}
+                for row in rows}
+
+    @staticmethod
+    def _product(values):
+        product = SimpleNamespace(**values)
+        for name in _datetime_columns():
+            value = values.get(name)
+            if value is not None:
+                setattr(product, name, datetime.fromisoformat(value))
+        return product
@@ -5,156 +5,1797 @@ Handles fuzzy matching, typo correction, and relevance scoring
 """
 
 import re
+import atexit
+import heapq
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, insort
 from difflib import SequenceMatcher
-from collections import Counter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from types import SimpleNamespace
 import math
 
+import numpy as np
+from nltk.stem.snowball import SnowballStemmer
+
+from utils.facets import PRICE_EDGES, build_facets
+
+# Minimum SequenceMatcher ratio for a product word to count as a typo match
+SIMILARITY_CUTOFF = 0.7
+
+# Spelling suggestions: max edit distance and how much of a word the delete
+# dictionary covers (SymSpell's prefix trick keeps it small)
+MAX_EDIT_DISTANCE = 2
+DELETE_PREFIX_LENGTH = 7
+
+# Per-field boosts (name > category/brand > description) and BM25 parameters
+FIELD_BOOSTS = {'name': 2.0, 'category': 1.5, 'brand': 1.5, 'description': 0.5}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Click-through boosts: weight added for a CTR of 1.0, smoothing for queries
+# with few searches, and how many products each query word may boost
+CLICK_BOOST_WEIGHT = 2.0
+CLICK_PRIOR_SEARCHES = 10
+CLICK_BOOSTS_PER_WORD = 50
+
+# Result cache budget: matches held across all cached queries, at about
+# 20 bytes each (id, score and slot), on top of the cache_size entry limit
+CACHE_MAX_MATCHES = 1_000_000
+
+# Product columns the search index reads, and how far back before the last
+# seen updated_at an index sync looks again, for writes committed after a
+# newer one or stamped by a worker whose clock is behind
+INDEXED_COLUMNS = ('id', 'name', 'category', 'brand', 'short_description', 'rating', 'price')
+SYNC_OVERLAP = timedelta(minutes=1)
+
+# Longest query search history keeps (the term columns of search_query and search_click)
+MAX_HISTORY_TERM = 200
+
+# Bumped whenever the snapshot file layout changes
+SNAPSHOT_FORMAT = 2
+
+# Words that only share a synonym group with a query word weigh a little
+# less than ones sharing its stem
+SYNONYM_WEIGHT = 0.9
+
+# Built-in synonym groups, any word of a group finds the others
+# (replaced by set_synonyms(), e.g. from SEARCH_SYNONYMS_FILE)
+DEFAULT_SYNONYMS = (
+    ('tv', 'television'),
+    ('mobile', 'phone', 'smartphone', 'cellphone'),
+    ('earphone', 'earbud', 'headphone', 'headset'),
+    ('fridge', 'refrigerator'),
+    ('sofa', 'couch'),
+    ('sneaker', 'trainer'),
+    ('tshirt', 'tee'),
+    ('perfume', 'fragrance'),
+    ('woman', 'women', 'ladies'),
+    ('man', 'men', 'gents'),
+    ('kid', 'children', 'child'),
+)
+
+# Typeahead shows categories first, then brands, then product names
+SUGGEST_KINDS = ('category', 'brand', 'product')
+# Prefix matches examined per typeahead request before ranking
+SUGGEST_SCAN = 200
+
+
+def term_grams(term):
+    """
+    Padded character bigrams of a term, used to find fuzzy candidates.
+
+    Two words with no padded bigram in common can never reach a
+    SequenceMatcher ratio above 2/3, so looking candidates up through
+    these grams cannot miss a match above SIMILARITY_CUTOFF.
+    """
+    padded = f"${term}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def term_deletes(term):
+    """
+    Strings left after deleting up to MAX_EDIT_DISTANCE characters from
+    the start of a term (SymSpell). Two words within that edit distance
+    share at least one of them.
+    """
+    deletes = {term[:DELETE_PREFIX_LENGTH]}
+    frontier = deletes
+    for _ in range(MAX_EDIT_DISTANCE):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        deletes = deletes | frontier
+    return deletes
+
+
+_stemmer = SnowballStemmer('english')
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """
+    Snowball stem of a lowercase word ("shoes" and "shoe" both give "shoe")
+    """
+    return _stemmer.stem(word)
+
+
+def synonym_table(groups):
+    """
+    Map the stem of every word in the synonym groups to its group's first stem
+    """
+    table = {}
+    for group in groups:
+        stems = [stem(word) for word in (w.strip().lower() for w in group) if re.fullmatch(r'\w+', word)]
+        for stemmed in stems:
+            table[stemmed] = stems[0]
+    return table
+
+
+def search_term(word, synonyms):
+    """
+    Index term of a word: its stem, folded onto its synonym group's
+    """
+    stemmed = stem(word)
+    return synonyms.get(stemmed, stemmed)
+
+
+def load_synonyms(path):
+    """
+    Synonym groups from a text file, one comma-separated group per line
+    ("tv, television"). Blank lines and # comments are skipped.
+    """
+    groups = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                groups.append(tuple(word.strip() for word in line.split(',') if word.strip()))
+    return groups
+
+
+def edit_distance(word1, word2, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Optimal string alignment distance (adjacent swaps count as one edit).
+    Returns max_distance + 1 as soon as the distance is known to exceed it.
+    """
+    if abs(len(word1) - len(word2)) > max_distance:
+        return max_distance + 1
+    previous = None
+    current = list(range(len(word2) + 1))
+    for i in range(1, len(word1) + 1):
+        before, previous = previous, current
+        current = [i] + [0] * len(word2)
+        for j in range(1, len(word2) + 1):
+            cost = 0 if word1[i - 1] == word2[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and word1[i - 1] == word2[j - 2]
+                    and word1[i - 2] == word2[j - 1]):
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+    return current[-1]
+
+
 class SmartSearch:
-    def __init__(self, products):
+    def __init__(self, products=(), cache_size=256, synonyms=DEFAULT_SYNONYMS):
         """
         Initialize with list of products
         """
-        self.products = products
-        self.build_index()
+        self._lock = threading.Lock()
+        self.synonyms = synonym_table(synonyms)  # stem -> stem of its synonym group
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (normalized query, threshold) -> matches and their sorted prefix
+        self._cached_matches = 0     # matches held by _cache, kept under CACHE_MAX_MATCHES
+        self.version = 0             # bumped on every catalog change
+        self.click_boosts = {}       # query word -> ((product id, boost), ...)
+        self._details = None         # deferred part of a loaded snapshot
+        self.build_index(products)
+    
+    def __len__(self):
+        """
+        Number of indexed products
+        """
+        return len(self.slots)
     
-    def build_index(self):
+    def build_index(self, products):
         """
         Build search index with product keywords
+
+        Every product gets a slot (row) in dense per-product arrays; postings
+        hold slots so a query can score the whole catalog with NumPy.
+        """
+        tokenized = [(product, self._tokenize(product)) for product in products]
+        field_totals = {field: 0 for field in FIELD_BOOSTS}
+        for _, fields in tokenized:
+            for field, tokens in fields.items():
+                field_totals[field] += len(tokens)
+        avg_lengths = self._avg_lengths(field_totals, len(tokenized))
+        
+        index = {}
+        slots = {}                  # product id -> slot
+        slot_ids = array('q')       # slot -> product id (0 when free)
+        ratings = array('f')        # slot -> rating
+        prices = array('f')         # slot -> price
+        category_codes = array('i') # slot -> code of the category in facet_values
+        brand_codes = array('i')    # slot -> code of the brand in facet_values
+        facet_values = [None]       # code -> category or brand (0 when missing)
+        facet_codes = {}            # category or brand -> code
+        postings = {}               # word -> (slots, BM25F impacts), as parallel arrays
+        name_postings = {}          # word -> slots whose product name has the word
+        grams = {}                  # bigram -> vocabulary words containing it
+        terms = {}                  # stem (synonyms folded) -> vocabulary words with it
+        for product, fields in tokenized:
+            slot = len(slot_ids)
+            slots[product.id] = slot
+            slot_ids.append(product.id)
+            ratings.append(product.rating or 0)
+            prices.append(product.price or 0)
+            category_codes.append(self._facet_code(product.category, facet_codes, facet_values))
+            brand_codes.append(self._facet_code(product.brand, facet_codes, facet_values))
+            index[product.id] = self._make_entry(product, fields)
+            for word, impact in self._impacts(fields, avg_lengths).items():
+                if word not in postings:
+                    postings[word] = (array('i'), array('f'))
+                word_slots, impacts = postings[word]
+                word_slots.append(slot)
+                impacts.append(impact)
+            for word in set(fields['name']):
+                name_postings.setdefault(word, array('i')).append(slot)
+        deletes = {}                # SymSpell delete -> vocabulary words producing it
+        for word in postings:
+            self._link_word(word, self.term(word), grams, deletes, terms)
+        phrase_counts = Counter()   # (kind, text, product id) -> products showing it
+        for entry in index.values():
+            phrase_counts.update(entry['phrases'])
+        # Sorted typeahead keys, one per word a phrase can be completed from
+        suggest_keys = sorted(key for phrase in phrase_counts for key in self._phrase_keys(phrase))
+        
+        # Swap in the finished index so searches never see a half-built one
+        with self._lock:
+            self.index = index
+            self.slots = slots
+            self.slot_ids = slot_ids
+            self.ratings = ratings
+            self.prices = prices
+            self.category_codes = category_codes
+            self.brand_codes = brand_codes
+            self.facet_values = facet_values
+            self.facet_codes = facet_codes
+            self.free_slots = []
+            self.postings = postings
+            self.name_postings = name_postings
+            self.grams = grams
+            self.terms = terms
+            self.deletes = deletes
+            self.phrase_counts = phrase_counts
+            self.suggest_keys = suggest_keys
+            self.field_totals = field_totals
+            self._details = None
+            self.version += 1
+    
+    @staticmethod
+    def _tokenize(product):
+        """
+        Split each searchable field into lowercase words
+        """
+        return {
+            'name': re.findall(r'\w+', (product.name or '').lower()),
+            'category': re.findall(r'\w+', (product.category or '').lower()),
+            'brand': re.findall(r'\w+', (product.brand or '').lower()),
+            'description': re.findall(r'\w+', (product.short_description or '').lower())
+        }
+    
+    def _make_entry(self, product, fields):
+        """
+        Per-product data needed besides the postings (and to unlink the product)
+        """
+        words = []
+        for tokens in fields.values():
+            words.extend(tokens)
+        
+        return {
+            'id': product.id,
+            'words': list(dict.fromkeys(words)),
+            'name_words': list(dict.fromkeys(fields['name'])),
+            'name': (product.name or '').lower(),
+            'lengths': {field: len(tokens) for field, tokens in fields.items()},
+            'phrases': self._phrases(product)
+        }
+    
+    @staticmethod
+    def _phrases(product):
+        """
+        Typeahead phrases a product contributes, as (kind, text, product id)
+        """
+        phrases = []
+        if product.category:
+            phrases.append(('category', product.category, 0))
+        if product.brand:
+            phrases.append(('brand', product.brand, 0))
+        if product.name:
+            phrases.append(('product', product.name, product.id))
+        return phrases
+    
+    @staticmethod
+    def _phrase_keys(phrase):
+        """
+        Typeahead keys for a phrase, so "iph" finds "Apple iPhone 15"
+        """
+        kind, text, product_id = phrase
+        words = text.lower().split()
+        return [(' '.join(words[i:]), i, SUGGEST_KINDS.index(kind), text, product_id)
+                for i in range(len(words))]
+    
+    @staticmethod
+    def _avg_lengths(field_totals, count):
+        """
+        Average token count of each field, never zero
+        """
+        return {field: (total / count if count and total else 1.0)
+                for field, total in field_totals.items()}
+    
+    @staticmethod
+    def _impacts(fields, avg_lengths):
+        """
+        BM25F weight of every word in one product, field boosts included.
+
+        Precomputed at index time so a query only multiplies by idf.
+        """
+        impacts = {}
+        for field, tokens in fields.items():
+            if not tokens:
+                continue
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_lengths[field])
+            for word, tf in Counter(tokens).items():
+                weight = FIELD_BOOSTS[field] * tf * (BM25_K1 + 1) / (tf + norm)
+                impacts[word] = impacts.get(word, 0.0) + weight
+        return impacts
+    
+    def add_product(self, product):
+        """
+        Add or re-index a single product after it is saved
+        """
+        fields = self._tokenize(product)
+        entry = self._make_entry(product, fields)
+        with self._lock:
+            self._require_details()
+            self._unlink(product.id)
+            category_code = self._facet_code(product.category, self.facet_codes, self.facet_values)
+            brand_code = self._facet_code(product.brand, self.facet_codes, self.facet_values)
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.slot_ids[slot] = product.id
+                self.ratings[slot] = product.rating or 0
+                self.prices[slot] = product.price or 0
+                self.category_codes[slot] = category_code
+                self.brand_codes[slot] = brand_code
+            else:
+                slot = len(self.slot_ids)
+                self.slot_ids.append(product.id)
+                self.ratings.append(product.rating or 0)
+                self.prices.append(product.price or 0)
+                self.category_codes.append(category_code)
+                self.brand_codes.append(brand_code)
+            self.slots[product.id] = slot
+            self.index[product.id] = entry
+            for field, length in entry['lengths'].items():
+                self.field_totals[field] += length
+            # Averages drift slightly between full rebuilds, which is fine for ranking
+            avg_lengths = self._avg_lengths(self.field_totals, len(self.index))
+            for word, impact in self._impacts(fields, avg_lengths).items():
+                if word not in self.postings:
+                    self.postings[word] = (array('i'), array('f'))
+                    self._link_word(word, self.term(word), self.grams, self.deletes, self.terms)
+                word_slots, impacts = self.postings[word]
+                word_slots.append(slot)
+                impacts.append(impact)
+            for word in entry['name_words']:
+                self.name_postings.setdefault(word, array('i')).append(slot)
+            for phrase in entry['phrases']:
+                if not self.phrase_counts[phrase]:
+                    for key in self._phrase_keys(phrase):
+                        insort(self.suggest_keys, key)
+                self.phrase_counts[phrase] += 1
+            self.version += 1
+    
+    # Re-indexing an edited product is the same operation as adding it
+    update_product = add_product
+    
+    def remove_product(self, product_id):
+        """
+        Drop a deleted product from the index
+        """
+        with self._lock:
+            self._require_details()
+            self._unlink(product_id)
+            self.version += 1
+    
+    def _unlink(self, product_id):
+        """
+        Remove a product's entry and postings; caller holds the lock
+        """
+        entry = self.index.pop(product_id, None)
+        if entry is None:
+            return
+        slot = self.slots.pop(product_id)
+        self.slot_ids[slot] = 0
+        self.ratings[slot] = 0
+        self.prices[slot] = 0
+        self.category_codes[slot] = 0
+        self.brand_codes[slot] = 0
+        self.free_slots.append(slot)
+        for field, length in entry['lengths'].items():
+            self.field_totals[field] -= length
+        for word in entry['words']:
+            word_slots, impacts = self.postings[word]
+            position = word_slots.index(slot)
+            del word_slots[position]
+            del impacts[position]
+            if not word_slots:
+                # Last product using this word, drop it from the vocabulary
+                del self.postings[word]
+                self._unlink_word(word, self.term(word), self.grams, self.deletes, self.terms)
+        for word in entry['name_words']:
+            name_slots = self.name_postings[word]
+            del name_slots[name_slots.index(slot)]
+            if not name_slots:
+                del self.name_postings[word]
+        for phrase in entry['phrases']:
+            self.phrase_counts[phrase] -= 1
+            if not self.phrase_counts[phrase]:
+                del self.phrase_counts[phrase]
+                for key in self._phrase_keys(phrase):
+                    position = bisect_left(self.suggest_keys, key)
+                    del self.suggest_keys[position]
+
+    def save_snapshot(self, path, catalog_version):
+        """
+        Write the index to a snapshot directory tagged with catalog_version:
+        meta.json, vocabulary.txt (with the matching stems.txt), names.json,
+        phrases.json and memory-mappable .npy arrays.
+        Written beside the old snapshot and swapped in, so readers never see
+        half a snapshot.
+        """
+        with self._lock:
+            self._require_details()
+            vocabulary = list(self.postings)
+            word_ids = {word: i for i, word in enumerate(vocabulary)}
+            names = [None] * len(self.slot_ids)
+            lengths = np.zeros((len(self.slot_ids), len(FIELD_BOOSTS)), dtype=np.int32)
+            product_words = [[] for _ in self.slot_ids]
+            for product_id, entry in self.index.items():
+                slot = self.slots[product_id]
+                names[slot] = next((text for kind, text, _ in entry['phrases'] if kind == 'product'), '')
+                lengths[slot] = [entry['lengths'][field] for field in FIELD_BOOSTS]
+                product_words[slot] = [word_ids[word] for word in entry['words']]
+            name_vocabulary = list(self.name_postings)
+            phrases = {phrase: i for i, phrase in enumerate(self.phrase_counts)}
+            arrays = {
+                'slot_ids': np.array(self.slot_ids, dtype=np.int64),
+                'ratings': np.array(self.ratings, dtype=np.float32),
+                'prices': np.array(self.prices, dtype=np.float32),
+                'category_codes': np.array(self.category_codes, dtype=np.int32),
+                'brand_codes': np.array(self.brand_codes, dtype=np.int32),
+                'lengths': lengths,
+                'posting_offsets': self._offsets(self.postings[word][0] for word in vocabulary),
+                'posting_slots': self._concat((self.postings[word][0] for word in vocabulary), np.int32),
+                'posting_impacts': self._concat((self.postings[word][1] for word in vocabulary), np.float32),
+                'name_words': np.array([word_ids[word] for word in name_vocabulary], dtype=np.int32),
+                'name_offsets': self._offsets(self.name_postings[word] for word in name_vocabulary),
+                'name_slots': self._concat((self.name_postings[word] for word in name_vocabulary), np.int32),
+                'word_offsets': self._offsets(product_words),
+                'word_ids': self._concat(product_words, np.int32),
+                # Typeahead keys in sorted order, as (phrase, word position) pairs
+                'key_phrases': np.array([phrases[(SUGGEST_KINDS[key[2]], key[3], key[4])]
+                                         for key in self.suggest_keys], dtype=np.int32),
+                'key_words': np.array([key[1] for key in self.suggest_keys], dtype=np.int32),
+            }
+            meta = {
+                'format': SNAPSHOT_FORMAT,
+                'catalog_version': catalog_version,
+                'products': len(self.index),
+                'field_totals': self.field_totals,
+                'facet_values': self.facet_values,
+                'created_at': datetime.utcnow().isoformat(),
+            }
+            phrase_rows = [[kind, text, product_id, count]
+                           for (kind, text, product_id), count in self.phrase_counts.items()]
+        
+        temp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(temp_path, exist_ok=True)
+        for name, values in arrays.items():
+            np.save(os.path.join(temp_path, f"{name}.npy"), values)
+        with open(os.path.join(temp_path, 'vocabulary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(vocabulary))
+        # Stems rather than terms, so synonym changes don't invalidate the snapshot
+        with open(os.path.join(temp_path, 'stems.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(stem(word) for word in vocabulary))
+        with open(os.path.join(temp_path, 'names.json'), 'w', encoding='utf-8') as f:
+            json.dump(names, f)
+        with open(os.path.join(temp_path, 'phrases.json'), 'w', encoding='utf-8') as f:
+            json.dump(phrase_rows, f)
+        # meta.json last: a directory without it is never loaded
+        with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    
+    def load_snapshot(self, path, catalog_version):
         """
-        self.index = []
-        for product in self.products:
-            # Combine all searchable fields
-            text = f"{product.name} {product.category} {product.brand} {product.short_description}"
-            # Convert to lowercase and split into words
-            words = re.findall(r'\w+', text.lower())
+        Replace the index with a saved snapshot when it was taken at
+        catalog_version. Returns False (index unchanged) when there is no
+        usable snapshot for that version.
+
+        Only what searching needs is loaded up front. Product entries,
+        typeahead keys and the spelling dictionary are built by a
+        background thread, or by the first call that needs them.
+        """
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return False
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != SNAPSHOT_FORMAT or meta.get('catalog_version') != catalog_version:
+                return False
+            arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                      for name in os.listdir(path) if name.endswith('.npy')}
+            with open(os.path.join(path, 'vocabulary.txt'), encoding='utf-8') as f:
+                vocabulary = f.read()
+            vocabulary = vocabulary.split('\n') if vocabulary else []
+            with open(os.path.join(path, 'stems.txt'), encoding='utf-8') as f:
+                stems = f.read()
+            stems = stems.split('\n') if stems else []
+            if len(stems) != len(vocabulary):
+                raise ValueError('stems.txt does not match vocabulary.txt')
+            # Parsed later, only the deferred part needs them
+            with open(os.path.join(path, 'names.json'), encoding='utf-8') as f:
+                names_json = f.read()
+            with open(os.path.join(path, 'phrases.json'), encoding='utf-8') as f:
+                phrases_json = f.read()
             
-            self.index.append({
-                'product': product,
-                'words': words,
-                'name': product.name.lower(),
-                'category': product.category.lower() if product.category else '',
-                'brand': product.brand.lower() if product.brand else '',
-                'description': product.short_description.lower() if product.short_description else ''
-            })
+            # Slicing plain arrays is much cheaper than slicing memmaps
+            postings = {}
+            offsets = arrays['posting_offsets'].tolist()
+            posting_slots = array('i', arrays['posting_slots'].tobytes())
+            posting_impacts = array('f', arrays['posting_impacts'].tobytes())
+            for i, word in enumerate(vocabulary):
+                start, end = offsets[i], offsets[i + 1]
+                postings[word] = (posting_slots[start:end], posting_impacts[start:end])
+            name_postings = {}
+            offsets = arrays['name_offsets'].tolist()
+            name_slots = array('i', arrays['name_slots'].tobytes())
+            for i, word_id in enumerate(arrays['name_words'].tolist()):
+                name_postings[vocabulary[word_id]] = name_slots[offsets[i]:offsets[i + 1]]
+            slot_ids = array('q', arrays['slot_ids'].tobytes())
+            ratings = array('f', arrays['ratings'].tobytes())
+            prices = array('f', arrays['prices'].tobytes())
+            category_codes = array('i', arrays['category_codes'].tobytes())
+            brand_codes = array('i', arrays['brand_codes'].tobytes())
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"⚠️ Search index snapshot unusable, rebuilding: {e}")
+            return False
+        
+        facet_values = meta['facet_values']
+        slots = {product_id: slot for slot, product_id in enumerate(slot_ids) if product_id}
+        grams = {}
+        for word in postings:
+            for gram in term_grams(word):
+                grams.setdefault(gram, set()).add(word)
+        terms = {}
+        for word, stemmed in zip(vocabulary, stems):
+            terms.setdefault(self.synonyms.get(stemmed, stemmed), set()).add(word)
+        
+        built = []
+        build_lock = threading.Lock()
+        
+        def details():
+            """
+            (index, phrase_counts, suggest_keys, deletes) from the snapshot,
+            built once; a second caller waits for the first
+            """
+            with build_lock:
+                if not built:
+                    built.append(build_details())
+                return built[0]
+        
+        def build_details():
+            names = json.loads(names_json)
+            phrase_rows = json.loads(phrases_json)
+            lengths = arrays['lengths'].tolist()
+            offsets = arrays['word_offsets'].tolist()
+            word_ids = arrays['word_ids'].tolist()
+            index = {}
+            for product_id, slot in slots.items():
+                name = names[slot]
+                product = SimpleNamespace(id=product_id, name=name,
+                                          category=facet_values[category_codes[slot]],
+                                          brand=facet_values[brand_codes[slot]])
+                # Words share the vocabulary's strings
+                index[product_id] = {
+                    'id': product_id,
+                    'words': [vocabulary[word_id] for word_id in word_ids[offsets[slot]:offsets[slot + 1]]],
+                    'name_words': list(dict.fromkeys(re.findall(r'\w+', (name or '').lower()))),
+                    'name': (name or '').lower(),
+                    'lengths': dict(zip(FIELD_BOOSTS, lengths[slot])),
+                    'phrases': self._phrases(product)
+                }
+            phrases = [(kind, text, product_id) for kind, text, product_id, _ in phrase_rows]
+            phrase_counts = Counter({phrase: row[3] for phrase, row in zip(phrases, phrase_rows)})
+            # Every word position of a phrase is a key, so build each phrase's keys once
+            phrase_keys = {}
+            suggest_keys = []
+            for phrase_id, word_index in zip(arrays['key_phrases'].tolist(), arrays['key_words'].tolist()):
+                if phrase_id not in phrase_keys:
+                    phrase_keys[phrase_id] = self._phrase_keys(phrases[phrase_id])
+                suggest_keys.append(phrase_keys[phrase_id][word_index])
+            deletes = {}
+            for word in vocabulary:
+                for delete in term_deletes(word):
+                    deletes.setdefault(delete, set()).add(word)
+            return index, phrase_counts, suggest_keys, deletes
+        
+        with self._lock:
+            self.index = {}
+            self.slots = slots
+            self.slot_ids = slot_ids
+            self.ratings = ratings
+            self.prices = prices
+            self.category_codes = category_codes
+            self.brand_codes = brand_codes
+            self.facet_values = facet_values
+            self.facet_codes = {value: code for code, value in enumerate(facet_values) if code}
+            self.free_slots = [slot for slot, product_id in enumerate(slot_ids) if not product_id]
+            self.postings = postings
+            self.name_postings = name_postings
+            self.grams = grams
+            self.terms = terms
+            self.deletes = {}
+            self.phrase_counts = Counter()
+            self.suggest_keys = []
+            self.field_totals = meta['field_totals']
+            self._details = details
+            self.version += 1
+        threading.Thread(target=self._load_details, args=(details,), daemon=True).start()
+        return True
+    
+    def _load_details(self, details):
+        """
+        Build the deferred part of a snapshot without holding the lock
+        """
+        built = details()
+        with self._lock:
+            # Skip if a caller already needed them, or the index was rebuilt since
+            if self._details is details:
+                self.index, self.phrase_counts, self.suggest_keys, self.deletes = built
+                self._details = None
+    
+    def _require_details(self):
+        """
+        Finish loading a snapshot's deferred part now; caller holds the lock
+        """
+        if self._details is not None:
+            self.index, self.phrase_counts, self.suggest_keys, self.deletes = self._details()
+            self._details = None
+    
+    @staticmethod
+    def _offsets(sequences):
+        """
+        CSR offsets of a run of sequences stored back to back
+        """
+        offsets = [0]
+        for values in sequences:
+            offsets.append(offsets[-1] + len(values))
+        return np.array(offsets, dtype=np.int64)
+    
+    @staticmethod
+    def _concat(sequences, dtype):
+        values = [np.asarray(values, dtype=dtype) for values in sequences]
+        return np.concatenate(values) if values else np.zeros(0, dtype=dtype)
+    
+    @staticmethod
+    def _facet_code(value, codes, values):
+        """
+        Small integer code of a category or brand, so facets can count with NumPy
+        """
+        if not value:
+            return 0
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    @staticmethod
+    def _link_word(word, term, grams, deletes, terms):
+        """
+        Register a new vocabulary word, and its index term, in the lookup structures
+        """
+        for gram in term_grams(word):
+            grams.setdefault(gram, set()).add(word)
+        for delete in term_deletes(word):
+            deletes.setdefault(delete, set()).add(word)
+        terms.setdefault(term, set()).add(word)
+    
+    @staticmethod
+    def _unlink_word(word, term, grams, deletes, terms):
+        """
+        Forget a word that no product uses any more
+        """
+        for table, keys in ((grams, term_grams(word)), (deletes, term_deletes(word)), (terms, (term,))):
+            for key in keys:
+                words = table.get(key)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del table[key]
+    
+    def fuzzy_terms(self, q_word):
+        """
+        Vocabulary words similar enough to q_word, mapped to their similarity
+        """
+        candidates = set()
+        for gram in term_grams(q_word):
+            candidates.update(self.grams.get(gram, ()))
+        
+        matches = {}
+        matcher = SequenceMatcher(None, q_word)
+        for word in candidates:
+            if word == q_word:
+                matches[word] = 1.0
+                continue
+            matcher.set_seq2(word)
+            # Cheap upper bounds first, the full ratio only when they pass
+            if (matcher.real_quick_ratio() > SIMILARITY_CUTOFF
+                    and matcher.quick_ratio() > SIMILARITY_CUTOFF):
+                similarity = matcher.ratio()
+                if similarity > SIMILARITY_CUTOFF:
+                    matches[word] = similarity
+        return matches
+    
+    def substring_terms(self, q_word):
+        """
+        Vocabulary words that contain q_word (e.g. "phone" in "smartphones")
+        """
+        if len(q_word) < 2:
+            return [word for word in list(self.postings) if q_word in word]
+        
+        # A word containing q_word contains every inner bigram of it
+        inner = [q_word[i:i + 2] for i in range(len(q_word) - 1)]
+        posting_sets = sorted((self.grams.get(gram, set()) for gram in inner), key=len)
+        candidates = set(posting_sets[0]).intersection(*posting_sets[1:])
+        return [word for word in candidates if q_word in word]
+    
+    def term(self, word):
+        """
+        Index term of a word (see search_term)
+        """
+        return search_term(word, self.synonyms)
+    
+    def term_matches(self, q_word):
+        """
+        Vocabulary words sharing q_word's stem or synonym group, by exact lookup
+        """
+        q_stem = stem(q_word)
+        return {word: 1.0 if stem(word) == q_stem else SYNONYM_WEIGHT
+                for word in self.terms.get(self.synonyms.get(q_stem, q_stem), ())}
     
-    def calculate_word_similarity(self, word1, word2):
+    def match_terms(self, q_word, fuzzy=None):
+        """
+        Vocabulary words a query word matches, weighted by how closely.
+        Words sharing its stem or a synonym match fully, typos count by
+        similarity, partial words by how much they cover. Typos are only
+        looked for when fuzzy is True, or (fuzzy None) when no word shares
+        the query word's term.
+        """
+        matches = self.term_matches(q_word)
+        if fuzzy or (fuzzy is None and not matches):
+            for word, similarity in self.fuzzy_terms(q_word).items():
+                if similarity > matches.get(word, 0.0):
+                    matches[word] = similarity
+        for word in self.substring_terms(q_word):
+            coverage = len(q_word) / len(word)
+            if coverage > matches.get(word, 0.0):
+                matches[word] = coverage
+        return matches
+
+    def expand(self, query_words, fuzzy_words=None):
+        """
+        match_terms() of several query words, as {query word: {word: weight}}.
+        fuzzy_words, when given, are the query words to look for typos of.
+        """
+        with self._lock:
+            return {q_word: self.match_terms(q_word, None if fuzzy_words is None else q_word in fuzzy_words)
+                    for q_word in query_words}
+
+    def vocabulary(self):
+        with self._lock:
+            return list(self.postings)
+
+    def product_words(self, product_id):
+        """
+        Vocabulary words a product is indexed under (empty if it is not indexed)
+        """
+        with self._lock:
+            self._require_details()
+            entry = self.index.get(product_id)
+            return set(entry['words']) if entry else set()
+
+    def set_synonyms(self, groups):
         """
-        Calculate similarity between two words (handles typos)
+        Replace the synonym groups (see DEFAULT_SYNONYMS and load_synonyms)
+        """
+        with self._lock:
+            self.synonyms = synonym_table(groups)
+            terms = {}
+            for word in self.postings:
+                terms.setdefault(self.term(word), set()).add(word)
+            self.terms = terms
+            # Matches change, so cached results are stale
+            self.version += 1
+
+    def add_vocabulary(self, words):
+        """
+        Make words matchable by expand() without indexing any product
+        (the vocabulary slice a ShardedSearch worker expands against)
+        """
+        with self._lock:
+            self._require_details()
+            for word in words:
+                if word not in self.postings:
+                    self.postings[word] = (array('i'), array('f'))
+                    self._link_word(word, self.term(word), self.grams, self.deletes, self.terms)
+
+    def remove_vocabulary(self, words):
+        """
+        Undo add_vocabulary() for words no product here is indexed under
+        """
+        with self._lock:
+            self._require_details()
+            for word in words:
+                postings = self.postings.get(word)
+                if postings is not None and not postings[0]:
+                    del self.postings[word]
+                    self._unlink_word(word, self.term(word), self.grams, self.deletes, self.terms)
+
+    def clear_cache(self):
+        """
+        Drop cached rankings; for a caller whose expansions changed without this index changing
+        """
+        with self._lock:
+            self._cache.clear()
+            self._cached_matches = 0
+
+    @staticmethod
+    def normalize_query(query):
         """
-        if word1 == word2:
-            return 1.0
-        return SequenceMatcher(None, word1, word2).ratio()
+        Lowercase and collapse whitespace so equivalent queries share a cache entry
+        """
+        return ' '.join(query.lower().split())
     
-    def search(self, query, threshold=0.3):
+    def search(self, query, limit=None, offset=0, threshold=0.3, expansions=None):
         """
         Main search function
+
+        Returns ([(product_id, score), ...] for the requested page, total matches).
+        Only the top offset + limit matches are ever sorted. expansions
+        ({query word: match_terms()}) replaces the local vocabulary lookup.
+        """
+        with self._lock:
+            entry = self._cached(query, threshold, expansions)
+            total = len(entry['ids'])
+            end = total if limit is None else min(offset + limit, total)
+            if end > entry['sorted']:
+                self._sort_prefix(entry, end)
+            page = list(zip(entry['ids'][offset:end].tolist(), entry['scores'][offset:end].tolist()))
+        return page, total
+    
+    def facets(self, query, threshold=0.3):
+        """
+        Category, brand, price and rating counts over every match of a query
+        """
+        return build_facets(*self.count_facets(query, threshold))
+    
+    def count_facets(self, query, threshold=0.3, expansions=None):
+        """
+        Raw facet Counters (categories, brands, price buckets, rating floors).
+
+        Counted in one pass over the matched slots, sharing the cache entry
+        with search() so the query is only scored once.
+        """
+        with self._lock:
+            slots = self._cached(query, threshold, expansions)['slots']
+            values = self.facet_values
+            categories = np.bincount(np.frombuffer(self.category_codes, dtype=np.int32)[slots],
+                                     minlength=len(values))
+            brands = np.bincount(np.frombuffer(self.brand_codes, dtype=np.int32)[slots],
+                                 minlength=len(values))
+            prices = np.bincount(np.searchsorted(PRICE_EDGES, np.frombuffer(self.prices, dtype=np.float32)[slots],
+                                                 side='right'), minlength=len(PRICE_EDGES) + 1)
+            floors = np.clip(np.floor(np.frombuffer(self.ratings, dtype=np.float32)[slots]), 0, 5).astype(np.intp)
+            ratings = np.bincount(floors, minlength=6)
+        
+        return (
+            Counter({values[code]: int(n) for code, n in enumerate(categories) if code and n}),
+            Counter({values[code]: int(n) for code, n in enumerate(brands) if code and n}),
+            Counter(dict(enumerate(prices.tolist()))),
+            Counter(dict(enumerate(ratings.tolist())))
+        )
+    
+    def _cached(self, query, threshold, expansions=None):
+        """
+        Cache entry of a query, ranking it on a miss; caller holds the lock.
+
+        Least recently used entries are evicted past cache_size entries or
+        CACHE_MAX_MATCHES matches in total, whichever comes first; an entry
+        bigger than the whole budget is returned without being kept.
+        """
+        query = self.normalize_query(query)
+        key = (query, threshold)
+        entry = self._cache.get(key)
+        if entry is None or entry['version'] != self.version:
+            slots, scores = self._rank(query, threshold, expansions)
+            ids = np.array(self.slot_ids, dtype=np.int64)[slots]
+            # 'slots' stays unsorted; only ids and scores are put in rank order
+            entry = {'version': self.version, 'ids': ids, 'scores': scores, 'slots': slots, 'sorted': 0}
+            stale = self._cache.pop(key, None)
+            if stale is not None:
+                self._cached_matches -= len(stale['ids'])
+            if not self.cache_size or len(ids) > CACHE_MAX_MATCHES:
+                return entry
+            self._cache[key] = entry
+            self._cached_matches += len(ids)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size or self._cached_matches > CACHE_MAX_MATCHES:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_matches -= len(evicted['ids'])
+        return entry
+    
+    @staticmethod
+    def _sort_prefix(entry, k):
+        """
+        Put the best k matches of a cache entry in rank order, in place.
+
+        Only the unsorted remainder is partitioned, so pages that were
+        already served keep their order.
+        """
+        done = entry['sorted']
+        ids = entry['ids'][done:]
+        scores = entry['scores'][done:]
+        need = k - done
+        if need < len(scores):
+            # Select the best `need` without sorting the rest
+            top = np.argpartition(-scores, need - 1)[:need]
+            rest = np.setdiff1d(np.arange(len(scores)), top, assume_unique=True)
+        else:
+            top = np.arange(len(scores))
+            rest = top[:0]
+        # Sort by relevance score (highest first), product id breaks ties
+        top = top[np.lexsort((ids[top], -scores[top]))]
+        order = np.concatenate([top, rest])
+        entry['ids'][done:] = ids[order]
+        entry['scores'][done:] = scores[order]
+        entry['sorted'] = k
+    
+    def _rank(self, query, threshold, expansions=None):
+        """
+        Matching (slots, scores) for a normalized query, unsorted;
+        caller holds the lock
         """
-        query = query.lower().strip()
         if not query:
-            return []
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
         
         # Split query into words
-        query_words = re.findall(r'\w+', query)
+        query_words = list(dict.fromkeys(re.findall(r'\w+', query)))
         
-        results = []
-        for item in self.index:
-            score = self.calculate_relevance(item, query, query_words)
-            if score > threshold:
-                results.append((item['product'], score))
+        if not query_words:
+            # Nothing to look up (e.g. "+"), only a name match can apply
+            self._require_details()
+            slots = [self.slots[item['id']] for item in self.index.values() if query in item['name']]
+            return np.array(slots, dtype=np.intp), np.full(len(slots), 3.0, dtype=np.float32)
         
-        # Sort by relevance score (highest first)
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results
+        scores = self.score_terms(query_words, expansions)
+        matched = np.flatnonzero(scores > threshold)
+        return matched, scores[matched]
     
-    def calculate_relevance(self, item, query, query_words):
+    def score_terms(self, query_words, expansions=None):
         """
-        Calculate how relevant a product is to the search query
+        Score every slot against the query words; caller holds the lock.
+
+        Each query word contributes BM25 for its best-matching vocabulary
+        word in each product. Array views over the postings must not
+        outlive this call, so only freshly computed arrays are returned.
         """
-        score = 0.0
-        matched_terms = set()
-        
-        # 1. Exact match in name (highest priority)
-        if query in item['name']:
-            score += 3.0
-            matched_terms.add('name_exact')
+        total_slots = len(self.slot_ids)
+        total_products = len(self.slots)
+        term_scores = np.zeros(total_slots, dtype=np.float32)
+        hits = np.zeros(total_slots, dtype=np.int32)
+        name_hits = np.zeros(total_slots, dtype=np.int32)
+        for q_word in query_words:
+            best = np.zeros(total_slots, dtype=np.float32)
+            matches = expansions[q_word] if expansions is not None else self.match_terms(q_word)
+            for word, weight in matches.items():
+                if word not in self.postings:
+                    # Expanded against another shard's vocabulary
+                    continue
+                word_slots, impacts = self.postings[word]
+                df = len(word_slots)
+                idf = math.log(1 + (total_products - df + 0.5) / (df + 0.5))
+                slots = np.frombuffer(word_slots, dtype=np.int32)
+                values = np.frombuffer(impacts, dtype=np.float32) * np.float32(weight * idf)
+                best[slots] = np.maximum(best[slots], values)
+            term_scores += best
+            hits += best > 0
+            # The name has the word, or one sharing its stem or synonym group
+            in_name = np.zeros(total_slots, dtype=bool)
+            for word in self.terms.get(self.term(q_word), ()):
+                if word in self.name_postings:
+                    in_name[np.frombuffer(self.name_postings[word], dtype=np.int32)] = True
+            name_hits += in_name
         
-        # 2. Word-by-word matching
+        # Products shoppers picked for these words before
+        click_boosts = np.zeros(total_slots, dtype=np.float32)
         for q_word in query_words:
-            # Check name words
-            for p_word in item['words']:
-                similarity = self.calculate_word_similarity(q_word, p_word)
-                if similarity > 0.7:  # High similarity threshold
-                    score += similarity * 2.0
-                    matched_terms.add(f'name_{q_word}')
-                    break
-            
-            # Check category
-            if q_word in item['category']:
-                score += 1.5
-                matched_terms.add('category')
-            
-            # Check brand
-            if q_word in item['brand']:
-                score += 1.5
-                matched_terms.add('brand')
-            
-            # Check description
-            if q_word in item['description']:
-                score += 0.5
-                matched_terms.add('description')
+            for product_id, boost in self.click_boosts.get(q_word, ()):
+                slot = self.slots.get(product_id)
+                if slot is not None:
+                    click_boosts[slot] += boost
+        
+        ratings = np.frombuffer(self.ratings, dtype=np.float32).copy()
+        return self.calculate_relevance(term_scores, hits, name_hits == len(query_words), ratings, click_boosts)
+    
+    def calculate_relevance(self, term_scores, hits, name_matches, ratings, click_boosts):
+        """
+        Final scores from the BM25 term scores, one array element per slot
+        """
+        scores = term_scores + click_boosts
+        
+        # 1. Every query word in the name (highest priority)
+        scores[name_matches] += 3.0
         
-        # 3. Bonus for matching multiple words
-        if len(matched_terms) > 1:
-            score += len(matched_terms) * 0.3
+        # 2. Bonus for matching multiple words
+        scores += np.where(hits > 1, hits * 0.3, 0.0).astype(np.float32)
         
-        # 4. Popularity bonus (higher rated products get slight boost)
-        score += item['product'].rating * 0.1
+        # 3. Popularity bonus (higher rated products get slight boost)
+        scores += ratings * 0.1
         
-        return score
+        # Products that match nothing are not results, however well rated
+        scores[hits == 0] = 0.0
+        return scores
+    
+    def set_click_boosts(self, click_boosts):
+        """
+        Swap in a recomputed click-through boost table (see SearchHistory.compute_click_boosts)
+        """
+        with self._lock:
+            self.click_boosts = click_boosts
+            # Rankings change, so cached results are stale
+            self._cache.clear()
+            self._cached_matches = 0
+    
+    def suggest(self, prefix, limit=8):
+        """
+        Typeahead completions for a prefix, as dicts with text, type and id.
+
+        Phrases starting with the prefix come before ones where a later
+        word does; then categories, brands and products; then the most
+        used. Only the first SUGGEST_SCAN matching keys are examined.
+        """
+        return self._format_suggestions(self.suggest_matches(prefix), limit)
+    
+    def suggest_matches(self, prefix):
+        """
+        Phrases completing a prefix, as (later word, kind rank, count, text, product id)
+        """
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        
+        matches = []
+        with self._lock:
+            self._require_details()
+            keys = self.suggest_keys
+            position = bisect_left(keys, (prefix,))
+            while position < len(keys) and len(matches) < SUGGEST_SCAN:
+                key, word_index, kind_rank, text, product_id = keys[position]
+                if not key.startswith(prefix):
+                    break
+                count = self.phrase_counts[(SUGGEST_KINDS[kind_rank], text, product_id)]
+                matches.append((word_index > 0, kind_rank, count, text, product_id))
+                position += 1
+        return matches
+    
+    @staticmethod
+    def _format_suggestions(matches, limit):
+        """
+        Rank suggest_matches() output and keep one suggestion per phrase
+        """
+        suggestions = []
+        seen = set()
+        for _, kind_rank, _, text, product_id in sorted(matches, key=lambda m: (m[0], m[1], -m[2], m[3], m[4])):
+            if (kind_rank, text) in seen:
+                continue
+            seen.add((kind_rank, text))
+            suggestions.append({'text': text, 'type': SUGGEST_KINDS[kind_rank], 'id': product_id or None})
+            if len(suggestions) == limit:
+                break
+        return suggestions
     
     def suggest_corrections(self, query):
         """
         Suggest spelling corrections for mispelled queries
         """
-        from difflib import get_close_matches
-        
-        # Get all unique words from product names
-        all_words = set()
-        for item in self.index:
-            all_words.update(item['words'])
-        
         query_words = re.findall(r'\w+', query.lower())
-        suggestions = []
+        return self._corrected_query(query_words, [self.correction_candidates(query_words)])
+    
+    def correction_candidates(self, query_words):
+        """
+        For each query word: None when it (or a word sharing its stem or
+        synonym group) is in the vocabulary, otherwise
+        {close vocabulary word: (edit distance, products using it)}
+        """
+        with self._lock:
+            self._require_details()
+            return [None if q_word in self.postings or self.term(q_word) in self.terms else self._close_words(q_word)
+                    for q_word in query_words]
+    
+    def _close_words(self, q_word):
+        """
+        Vocabulary words within edit distance of an unknown word; caller holds the lock
+        """
+        # Short words only get one edit, or everything looks like a typo of them
+        max_distance = 1 if len(q_word) <= 4 else MAX_EDIT_DISTANCE
+        candidates = set()
+        for delete in term_deletes(q_word):
+            candidates.update(self.deletes.get(delete, ()))
         
-        for q_word in query_words:
-            matches = get_close_matches(q_word, all_words, n=3, cutoff=0.7)
-            if matches and matches[0] != q_word:
-                suggestions.append(matches[0])
+        close = {}
+        for word in candidates:
+            distance = edit_distance(q_word, word, max_distance)
+            if distance <= max_distance:
+                close[word] = (distance, len(self.postings[word][0]))
+        return close
+    
+    @staticmethod
+    def _corrected_query(query_words, shard_candidates):
+        """
+        Corrected query from the correction_candidates() of one or more
+        indexes, or None when nothing changes. Known words are kept; an
+        unknown one becomes the closest candidate, then the most used.
+        """
+        suggestions = []
+        changed = False
+        for position, q_word in enumerate(query_words):
+            candidates = [shard[position] for shard in shard_candidates]
+            if any(close is None for close in candidates):
+                suggestions.append(q_word)
+                continue
+            merged = {}
+            for close in candidates:
+                for word, (distance, count) in close.items():
+                    merged[word] = (distance, merged.get(word, (distance, 0))[1] + count)
+            if merged:
+                suggestions.append(min(merged, key=lambda word: (merged[word][0], -merged[word][1], word)))
+                changed = True
+            else:
+                suggestions.append(q_word)
         
-        if suggestions:
-            corrected = ' '.join(suggestions)
-            return corrected
+        if changed:
+            return ' '.join(suggestions)
         return None
 
 
+# Held by each ShardedSearch worker process: its share of the products,
+# and its slice of the catalog vocabulary for expanding query words
+_shard = None
+_lexicon = None
+
+
+def _init_shard(cache_size, synonyms):
+    global _shard, _lexicon
+    _shard = SmartSearch(cache_size=cache_size, synonyms=synonyms)
+    _lexicon = SmartSearch(cache_size=0, synonyms=synonyms)
+
+
+def _shard_call(method, *args):
+    return getattr(_shard, method)(*args)
+
+
+def _lexicon_call(method, *args):
+    return getattr(_lexicon, method)(*args)
+
+
+def _change_shard(product_id, record=None):
+    """
+    Index record as product_id on this worker's shard, or remove the
+    product when record is None; returns the words its vocabulary gained
+    and the words it lost
+    """
+    words = _shard.product_words(product_id)
+    if record is not None:
+        words.update(word for tokens in SmartSearch._tokenize(record).values() for word in tokens)
+    before = {word for word in words if word in _shard.postings}
+    if record is None:
+        _shard.remove_product(product_id)
+    else:
+        _shard.add_product(record)
+    after = {word for word in words if word in _shard.postings}
+    return after - before, before - after
+
+
+def _build_lexicon(words):
+    _lexicon.build_index(())
+    _lexicon.add_vocabulary(words)
+
+
+def _set_synonyms(groups):
+    _shard.set_synonyms(groups)
+    _lexicon.set_synonyms(groups)
+
+
+class ShardedSearch:
+    """
+    SmartSearch split across worker processes so one query can use
+    several cores.
+
+    Products go to shard id % shards. A query runs in two parallel rounds:
+    every worker expands the query words against its slice of the
+    vocabulary (the fuzzy lookup is the Python-bound part; it is skipped
+    for words whose stem or synonym group is in the catalog, which the
+    parent tracks), then every
+    shard scores its products with the merged expansions and the per-shard
+    top matches are merged. Facets, typeahead and spelling counts are
+    summed across shards. Term statistics (idf, average field lengths) are
+    per shard, which hash sharding keeps close to the catalog-wide ones.
+    Workers are forked, so this needs a platform with fork() (see supported()).
+    """
+    
+    def __init__(self, shards, products=(), cache_size=256, synonyms=DEFAULT_SYNONYMS):
+        context = multiprocessing.get_context('fork')
+        self.shards = [ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                           initializer=_init_shard, initargs=(cache_size, synonyms))
+                       for _ in range(shards)]
+        self.synonyms = synonym_table(synonyms)
+        self.word_shards = Counter()    # catalog word -> number of shards indexing it
+        self.terms = Counter()          # index term -> number of catalog words with it
+        if products:
+            self.build_index(products)
+    
+    @staticmethod
+    def supported():
+        return 'fork' in multiprocessing.get_all_start_methods()
+    
+    normalize_query = staticmethod(SmartSearch.normalize_query)
+    
+    @staticmethod
+    def _record(product):
+        """
+        Picklable copy of the product fields the index uses
+        """
+        return SimpleNamespace(id=product.id, name=product.name, category=product.category,
+                               brand=product.brand, short_description=product.short_description,
+                               rating=product.rating, price=product.price)
+    
+    def _owner(self, word):
+        """
+        Worker whose vocabulary slice holds a word (stable across processes, unlike hash())
+        """
+        return zlib.crc32(word.encode()) % len(self.shards)
+    
+    def _call_all(self, function, method, *args):
+        """
+        Run a SmartSearch method in every worker in parallel, results in shard order
+        """
+        futures = [shard.submit(function, method, *args) for shard in self.shards]
+        return [future.result() for future in futures]
+    
+    def _expand(self, query):
+        """
+        Expansions of a query's words, looked up across all vocabulary slices
+        """
+        query_words = list(dict.fromkeys(re.findall(r'\w+', self.normalize_query(query))))
+        # Same rule as SmartSearch.match_terms, decided here for the whole vocabulary
+        fuzzy_words = [q_word for q_word in query_words if search_term(q_word, self.synonyms) not in self.terms]
+        expansions = {q_word: {} for q_word in query_words}
+        for shard_expansions in self._call_all(_lexicon_call, 'expand', query_words, fuzzy_words):
+            for q_word, matches in shard_expansions.items():
+                expansions[q_word].update(matches)
+        return expansions
+    
+    def __len__(self):
+        return sum(self._call_all(_shard_call, '__len__'))
+    
+    def build_index(self, products):
+        parts = [[] for _ in self.shards]
+        for product in products:
+            parts[product.id % len(self.shards)].append(self._record(product))
+        futures = [shard.submit(_shard_call, 'build_index', part) for shard, part in zip(self.shards, parts)]
+        for future in futures:
+            future.result()
+        self._build_lexicons()
+    
+    def _shard_paths(self, path):
+        return [os.path.join(path, f"shard-{k}-of-{len(self.shards)}") for k in range(len(self.shards))]
+    
+    def save_snapshot(self, path, catalog_version):
+        """
+        One SmartSearch snapshot per shard, in subdirectories of path
+        """
+        os.makedirs(path, exist_ok=True)
+        futures = [shard.submit(_shard_call, 'save_snapshot', shard_path, catalog_version)
+                   for shard, shard_path in zip(self.shards, self._shard_paths(path))]
+        for future in futures:
+            future.result()
+    
+    def load_snapshot(self, path, catalog_version):
+        """
+        Load every shard's snapshot; False when any shard has none for
+        catalog_version (the shards that did load are then rebuilt anyway)
+        """
+        futures = [shard.submit(_shard_call, 'load_snapshot', shard_path, catalog_version)
+                   for shard, shard_path in zip(self.shards, self._shard_paths(path))]
+        if not all([future.result() for future in futures]):
+            return False
+        self._build_lexicons()
+        return True
+    
+    def _build_lexicons(self):
+        """
+        Split the shards' combined vocabulary into the per-worker expansion slices
+        """
+        slices = [[] for _ in self.shards]
+        self.word_shards = Counter()
+        for words in self._call_all(_shard_call, 'vocabulary'):
+            self.word_shards.update(words)
+        for word in self.word_shards:
+            slices[self._owner(word)].append(word)
+        self.terms = Counter(search_term(word, self.synonyms) for word in self.word_shards)
+        futures = [shard.submit(_build_lexicon, words) for shard, words in zip(self.shards, slices)]
+        for future in futures:
+            future.result()
+    
+    def add_product(self, product):
+        record = self._record(product)
+        # New words become matchable first
+        slices = [[] for _ in self.shards]
+        for tokens in SmartSearch._tokenize(record).values():
+            for word in set(tokens):
+                slices[self._owner(word)].append(word)
+        for shard, words in zip(self.shards, slices):
+            if words:
+                shard.submit(_lexicon_call, 'add_vocabulary', words).result()
+        self._change(product.id, record)
+    
+    update_product = add_product
+    
+    def remove_product(self, product_id):
+        self._change(product_id)
+    
+    def _change(self, product_id, record=None):
+        """
+        Apply a product change on its shard and keep the catalog-wide
+        vocabulary (terms, expansion slices) in step with a single index
+        """
+        shard = self.shards[product_id % len(self.shards)]
+        gained, lost = shard.submit(_change_shard, product_id, record).result()
+        added = [word for word in gained if not self.word_shards[word]]
+        self.word_shards.update(gained)
+        self.word_shards.subtract(lost)
+        removed = [word for word in lost if self.word_shards[word] <= 0]
+        for word in added:
+            self.terms[search_term(word, self.synonyms)] += 1
+        for word in removed:
+            del self.word_shards[word]
+            term = search_term(word, self.synonyms)
+            self.terms[term] -= 1
+            if self.terms[term] <= 0:
+                del self.terms[term]
+        if removed:
+            slices = [[] for _ in self.shards]
+            for word in removed:
+                slices[self._owner(word)].append(word)
+            for shard, words in zip(self.shards, slices):
+                if words:
+                    shard.submit(_lexicon_call, 'remove_vocabulary', words).result()
+        if added or removed:
+            # Query expansions depend on the whole vocabulary, which the other
+            # shards' cache versions know nothing about
+            self._call_all(_shard_call, 'clear_cache')
+    
+    def search(self, query, limit=None, offset=0, threshold=0.3):
+        """
+        Same contract as SmartSearch.search; each shard ranks only its
+        best offset + limit matches
+        """
+        end = None if limit is None else offset + limit
+        results = self._call_all(_shard_call, 'search', query, end, 0, threshold, self._expand(query))
+        total = sum(shard_total for _, shard_total in results)
+        # Shard pages are already ordered by score, then product id
+        merged = heapq.merge(*(page for page, _ in results), key=lambda match: (-match[1], match[0]))
+        return list(islice(merged, offset, end)), total
+    
+    def facets(self, query, threshold=0.3):
+        totals = (Counter(), Counter(), Counter(), Counter())
+        for counts in self._call_all(_shard_call, 'count_facets', query, threshold, self._expand(query)):
+            for total, shard_counts in zip(totals, counts):
+                total.update(shard_counts)
+        return build_facets(*totals)
+    
+    def suggest(self, prefix, limit=8):
+        # The same category or brand shows up on every shard, so add up its counts
+        counts = Counter()
+        for matches in self._call_all(_shard_call, 'suggest_matches', prefix):
+            # A phrase matching at two word positions is listed twice with the same count
+            counts.update({(later_word, kind_rank, text, product_id): count
+                           for later_word, kind_rank, count, text, product_id in matches})
+        matches = [(later_word, kind_rank, count, text, product_id)
+                   for (later_word, kind_rank, text, product_id), count in counts.items()]
+        return SmartSearch._format_suggestions(matches, limit)
+    
+    def suggest_corrections(self, query):
+        query_words = re.findall(r'\w+', query.lower())
+        return SmartSearch._corrected_query(query_words,
+                                            self._call_all(_shard_call, 'correction_candidates', query_words))
+    
+    def set_synonyms(self, groups):
+        self._call_all(_set_synonyms, groups)
+        self.synonyms = synonym_table(groups)
+        self.terms = Counter(search_term(word, self.synonyms) for word in self.word_shards)
+    
+    def set_click_boosts(self, click_boosts):
+        # Boosts for products on other shards are ignored by each shard
+        self._call_all(_shard_call, 'set_click_boosts', click_boosts)
+    
+    def close(self):
+        for shard in self.shards:
+            shard.shutdown()
+
+
 class SearchHistory:
     """
     Track and learn from user searches
+
+    Searches and clicks are counted in memory and written to the database
+    in batches by a background thread, so logging never waits on the
+    database. After each flush that wrote something, and every
+    boost_interval for the other workers' writes, the hot aggregates are
+    reloaded from the database, which keeps every worker's popular and
+    related searches in step and bounds their size. The same thread applies
+    the other workers' product changes to the search index.
     """
-    def __init__(self):
+    def __init__(self, max_queries=1000, max_clicks=20000, flush_interval=5.0, batch_size=500,
+                 boost_interval=300.0):
+        self.max_queries = max_queries        # queries kept for popular searches
+        self.max_clicks = max_clicks          # (query, product) click pairs kept in memory
+        self.flush_interval = flush_interval  # seconds between background flushes
+        self.batch_size = batch_size          # pending events that trigger an early flush
+        self.boost_interval = boost_interval  # seconds between click-boost recomputes
         self.popular_searches = Counter()
-        self.search_results = {}  # query -> list of product IDs clicked
+        self.search_results = {}  # query -> Counter of product IDs clicked
+        self.product_queries = {}  # product ID -> Counter of queries it was clicked from
+        self._pending_searches = Counter()
+        self._pending_results = {}   # query -> latest results count
+        self._pending_clicks = Counter()  # (query, product_id) -> clicks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._retrying = False       # the pending batch already failed once
+        self.app = None
+        self.search_index = None
+        self.catalog_revision = None  # catalog revision search_index is current with
+        self.indexed_until = None     # latest product updated_at search_index has seen
+        self.fingerprints = {}        # product id -> hash of its INDEXED_COLUMNS, as indexed
+    
+    def init_app(self, app, search_index=None, index_state=None):
+        """
+        Load the stored history and start the background writer, which
+        also keeps search_index's click-through boosts up to date and
+        applies other workers' product changes to it; index_state is
+        index_state() as read before search_index was built
+        """
+        from models import catalog_revision_listeners
+        
+        self.app = app
+        self.search_index = search_index
+        if index_state is not None:
+            self.catalog_revision, self.indexed_until, self.fingerprints = index_state
+            catalog_revision_listeners.append(self.catalog_committed)
+        self._reload()
+        self.update_click_boosts()
+        thread = threading.Thread(target=self._run, name='search-history-writer', daemon=True)
+        thread.start()
+        atexit.register(self.flush)
+    
+    @staticmethod
+    def history_term(query):
+        """
+        A query as history stores it: normalized and cut to the term column,
+        so long queries sharing a prefix are counted as one
+        """
+        return SmartSearch.normalize_query(query)[:MAX_HISTORY_TERM]
     
     def log_search(self, query, results_count):
         """Log a search query"""
-        self.popular_searches[query.lower()] += 1
+        query = self.history_term(query)
+        with self._lock:
+            self.popular_searches[query] += 1
+            self._pending_searches[query] += 1
+            self._pending_results[query] = results_count
+            # Keep the in-memory aggregate bounded between reloads
+            if len(self.popular_searches) > 2 * self.max_queries:
+                self.popular_searches = Counter(dict(self.popular_searches.most_common(self.max_queries)))
+            pending = len(self._pending_searches) + len(self._pending_clicks)
+        if pending >= self.batch_size:
+            self._wake.set()
     
     def log_click(self, query, product_id):
         """Log when user clicks on a search result"""
-        query = query.lower()
-        if query not in self.search_results:
-            self.search_results[query] = []
-        self.search_results[query].append(product_id)
+        query = self.history_term(query)
+        with self._lock:
+            self.search_results.setdefault(query, Counter())[product_id] += 1
+            self.product_queries.setdefault(product_id, Counter())[query] += 1
+            self._pending_clicks[(query, product_id)] += 1
+            pending = len(self._pending_searches) + len(self._pending_clicks)
+        if pending >= self.batch_size:
+            self._wake.set()
+    
+    def _run(self):
+        """
+        Background loop: flush every flush_interval seconds, or sooner when
+        woken, and check the search index is still current
+        """
+        last_boost = time.monotonic()
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - last_boost >= self.boost_interval:
+                    last_boost = time.monotonic()
+                    # Other workers' searches and clicks, then the boosts they feed
+                    self._reload()
+                    self.update_click_boosts()
+            except Exception as e:
+                print(f"⚠️ Search history flush failed: {e}")
+            try:
+                self.sync_index()
+            except Exception as e:
+                print(f"⚠️ Search index refresh failed: {e}")
+    
+    @staticmethod
+    def indexed_rows(since=None):
+        """
+        INDEXED_COLUMNS and updated_at of the products updated after since
+        (all products when since is None); needs an app context
+        """
+        from models import db, Product
+        
+        query = db.session.query(*[getattr(Product, column) for column in INDEXED_COLUMNS], Product.updated_at)
+        if since is not None:
+            query = query.filter(Product.updated_at > since - SYNC_OVERLAP)
+        return query.all()
+    
+    @staticmethod
+    def fingerprint(row):
+        return hash(tuple(row)[:len(INDEXED_COLUMNS)])
+    
+    @classmethod
+    def index_state(cls):
+        """
+        (catalog revision, latest updated_at, {product id: fingerprint}) for
+        init_app; read it before building the index, so that changes made
+        during the build are caught by the first sync. Needs an app context.
+        """
+        from models import catalog_revision
+        
+        revision = catalog_revision()
+        rows = cls.indexed_rows()
+        indexed_until = max((row.updated_at for row in rows if row.updated_at), default=None)
+        return revision, indexed_until, {row.id: cls.fingerprint(row) for row in rows}
+    
+    def catalog_committed(self, before, after):
+        """
+        A commit in this process moved the catalog from revision before to
+        after; the code that committed patches search_index itself, so
+        unless another worker's change came first there is nothing to sync
+        """
+        if self.catalog_revision == before:
+            self.catalog_revision = after
+    
+    def sync_index(self):
+        """
+        Apply other workers' product changes to search_index once the
+        catalog revision moves: products updated since the last sync are
+        re-indexed if an indexed column changed (a stock or review count
+        change is skipped), and products no longer in the table are removed
+        """
+        from models import db, Product, catalog_revision
+        
+        if self.search_index is None or self.catalog_revision is None:
+            return
+        with self.app.app_context():
+            revision = catalog_revision()
+            if revision == self.catalog_revision:
+                return
+            # Read the revision first: a write during the sync moves it again
+            rows = self.indexed_rows(self.indexed_until)
+            product_ids = {product_id for product_id, in db.session.query(Product.id)}
+        
+        changed = 0
+        for row in rows:
+            fingerprint = self.fingerprint(row)
+            if self.fingerprints.get(row.id) != fingerprint:
+                self.search_index.update_product(SimpleNamespace(**row._asdict()))
+                self.fingerprints[row.id] = fingerprint
+                changed += 1
+            if row.updated_at and (self.indexed_until is None or row.updated_at > self.indexed_until):
+                self.indexed_until = row.updated_at
+        removed = [product_id for product_id in self.fingerprints if product_id not in product_ids]
+        for product_id in removed:
+            self.search_index.remove_product(product_id)
+            del self.fingerprints[product_id]
+        self.catalog_revision = revision
+        if changed or removed:
+            print(f"🔍 Search index synced to catalog revision {revision}: "
+                  f"{changed} products updated, {len(removed)} removed")
+    
+    def flush(self):
+        """
+        Write pending searches and clicks in one batch, then reload the
+        aggregates; nothing pending is a no-op, without a database round trip
+        """
+        if self.app is None:
+            return
+        with self._lock:
+            searches, self._pending_searches = self._pending_searches, Counter()
+            results, self._pending_results = self._pending_results, {}
+            clicks, self._pending_clicks = self._pending_clicks, Counter()
+        
+        if not (searches or clicks):
+            return
+        try:
+            self._write(searches, results, clicks)
+        except Exception:
+            if self._retrying:
+                # Failed twice: drop it rather than grow a batch that may never write
+                self._retrying = False
+                print(f"⚠️ Dropped {len(searches)} searches and {len(clicks)} clicks from search history")
+            else:
+                # Put the batch back so the next flush retries it once
+                self._retrying = True
+                with self._lock:
+                    self._pending_searches.update(searches)
+                    self._pending_results = {**results, **self._pending_results}
+                    self._pending_clicks.update(clicks)
+            raise
+        self._retrying = False
+        self._reload()
+    
+    def _write(self, searches, results, clicks):
+        """
+        Upsert the batch into the search_query and search_click tables
+        """
+        from models import db, SearchQuery, SearchClick
+        
+        with self.app.app_context():
+            if db.engine.dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            now = datetime.utcnow()
+            
+            if searches:
+                stmt = insert(SearchQuery).values([
+                    {'term': query, 'count': count,
+                     'results_count': results.get(query, 0), 'last_searched': now}
+                    for query, count in searches.items()
+                ])
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['term'],
+                    set_={'count': SearchQuery.count + stmt.excluded.count,
+                          'results_count': stmt.excluded.results_count,
+                          'last_searched': stmt.excluded.last_searched}
+                ))
+            if clicks:
+                stmt = insert(SearchClick).values([
+                    {'term': query, 'product_id': product_id, 'count': count, 'last_clicked': now}
+                    for (query, product_id), count in clicks.items()
+                ])
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['term', 'product_id'],
+                    set_={'count': SearchClick.count + stmt.excluded.count,
+                          'last_clicked': stmt.excluded.last_clicked}
+                ))
+            db.session.commit()
+    
+    def _reload(self):
+        """
+        Replace the in-memory aggregates with the stored top queries and
+        clicks, plus whatever has not been flushed yet
+        """
+        from models import db, SearchQuery, SearchClick
+        
+        with self.app.app_context():
+            top_queries = db.session.query(SearchQuery.term, SearchQuery.count)\
+                                    .order_by(SearchQuery.count.desc())\
+                                    .limit(self.max_queries).all()
+            top_clicks = db.session.query(SearchClick.term, SearchClick.product_id, SearchClick.count)\
+                                   .order_by(SearchClick.count.desc())\
+                                   .limit(self.max_clicks).all()
+        
+        popular = Counter(dict(top_queries))
+        clicked = {}
+        queries_by_product = {}
+        for query, product_id, count in top_clicks:
+            clicked.setdefault(query, Counter())[product_id] += count
+            queries_by_product.setdefault(product_id, Counter())[query] += count
+        
+        with self._lock:
+            popular.update(self._pending_searches)
+            for (query, product_id), count in self._pending_clicks.items():
+                clicked.setdefault(query, Counter())[product_id] += count
+                queries_by_product.setdefault(product_id, Counter())[query] += count
+            self.popular_searches = popular
+            self.search_results = clicked
+            self.product_queries = queries_by_product
+    
+    def compute_click_boosts(self):
+        """
+        Click-through boost table: query word -> ((product id, boost), ...)
+
+        A product's CTR for a query is its clicks over the query's searches
+        (smoothed by CLICK_PRIOR_SEARCHES); each word of the query credits
+        the product with it. Only the best CLICK_BOOSTS_PER_WORD products
+        per word are kept. Search counts are read for every clicked query,
+        not just the popular ones; clicks on a query with no stored or
+        pending searches are left out.
+        """
+        from models import db, SearchQuery
+        
+        with self._lock:
+            clicks = [(query, Counter(products)) for query, products in self.search_results.items()]
+            searches = Counter({query: self._pending_searches[query] for query, _ in clicks
+                                if query in self._pending_searches})
+        
+        if clicks:
+            with self.app.app_context():
+                searches.update(dict(
+                    db.session.query(SearchQuery.term, SearchQuery.count)
+                              .filter(SearchQuery.term.in_([query for query, _ in clicks])).all()))
+        
+        scores = {}
+        for query, products in clicks:
+            if not searches[query]:
+                continue
+            # Clicks can run ahead of a query's searches until both are flushed
+            denominator = max(searches[query], sum(products.values())) + CLICK_PRIOR_SEARCHES
+            for word in set(re.findall(r'\w+', query)):
+                word_scores = scores.setdefault(word, Counter())
+                for product_id, count in products.items():
+                    word_scores[product_id] += count / denominator
+        
+        return {
+            word: tuple((product_id, CLICK_BOOST_WEIGHT * min(ctr, 1.0))
+                        for product_id, ctr in word_scores.most_common(CLICK_BOOSTS_PER_WORD))
+            for word, word_scores in scores.items()
+        }
+    
+    def update_click_boosts(self):
+        """
+        Recompute the boost table and hand it to the search index
+        """
+        if self.search_index is not None:
+            self.search_index.set_click_boosts(self.compute_click_boosts())
     
     def get_popular_searches(self, limit=10):
         """Get most popular search queries"""
@@ -162,20 +1803,21 @@ class SearchHistory:
     
     def get_related_searches(self, query, limit=5):
         """Find related searches based on user behavior"""
-        query = query.lower()
-        if query not in self.search_results:
-            return []
-        
-        # Products clicked for this query
-        clicked_products = set(self.search_results[query])
+        query = self.history_term(query)
+        with self._lock:
+            clicked_products = list(self.search_results.get(query, ()))
+            # Other queries that led to the same products, from each product's posting list
+            related = Counter()
+            clicks = Counter()
+            for product_id in clicked_products:
+                for other_query, count in self.product_queries.get(product_id, {}).items():
+                    if other_query != query:
+                        related[other_query] += 1
+                        clicks[other_query] += count
         
-        # Find other queries that led to same products
-        related = Counter()
-        for other_query, products in self.search_results.items():
-            if other_query == query:
-                continue
-            common = clicked_products.intersection(set(products))
-            if common:
-                related[other_query] += len(common)
-        
-        return [q for q, _ in related.most_common(limit)]
\ No newline at end of file
+        # Most shared products first, then most clicks
+        return heapq.nsmallest(limit, related, key=lambda q: (-related[q], -clicks[q], q))
+
+# Process-wide index, built once at startup and patched by the admin
+# product routes instead of being rebuilt for every search
+search_index = SmartSearch()